@@ -0,0 +1,91 @@
+"""Realistic sonos2mqtt payloads used by the benchmarks."""
+from __future__ import annotations
+
+import json
+
+UUID = "RINCON_000E58000000001400"
+
+DISCOVERY = json.dumps(
+    {
+        "name": "Kitchen",
+        "unique_id": UUID,
+        "state_topic": f"sonos2mqtt/{UUID}",
+        "command_topic": f"sonos2mqtt/{UUID}/control",
+        "availability_topic": "sonos2mqtt/status",
+        "device_class": "speaker",
+        "icon": "mdi:speaker",
+        "device": {
+            "identifiers": [UUID],
+            "manufacturer": "Sonos",
+            "model": "Sonos One",
+            "name": "Kitchen",
+            "sw_version": "74.0-43160",
+        },
+    }
+)
+
+# Position update, the message that is received most often
+SMALL_STATE = json.dumps(
+    {
+        "uuid": UUID,
+        "name": "Kitchen",
+        "transportState": "PLAYING",
+        "volume": {"Master": 12, "LF": 100, "RF": 100},
+        "mute": {"Master": False, "LF": False, "RF": False},
+        "position": {"position": "0:01:32", "lastUpdate": 1681234567890},
+    }
+)
+
+TYPICAL_STATE = json.dumps(
+    {
+        "uuid": UUID,
+        "name": "Kitchen",
+        "groupName": "Kitchen + 1",
+        "coordinatorUuid": UUID,
+        "transportState": "PLAYING",
+        "playmode": "NORMAL",
+        "crossfade": "Off",
+        "shuffle": False,
+        "repeat": "Off",
+        "volume": {"Master": 12, "LF": 100, "RF": 100},
+        "mute": {"Master": False, "LF": False, "RF": False},
+        "currentTrack": {
+            "album": "Random Access Memories",
+            "artist": "Daft Punk",
+            "albumArtUri": "https://i.scdn.co/image/ab67616d0000b2739b9b36b0e22870b9f542d937",
+            "duration": "0:06:09",
+            "title": "Get Lucky",
+            "trackUri": "x-sonos-spotify:spotify%3atrack%3a69kOkLUCkxIZYexIgSG8rq",
+            "upnpClass": "object.item.audioItem.musicTrack",
+        },
+        "enqueuedMetadata": {
+            "title": "Daft Punk Mix",
+            "upnpClass": "object.container.playlistContainer",
+        },
+        "position": {"position": "0:01:32", "lastUpdate": 1681234567890},
+        "queueLength": 50,
+        "queuePosition": 3,
+    }
+)
+
+# Long queue with a lot of (unused) metadata, as sent by streaming services
+_large = json.loads(TYPICAL_STATE)
+_large["queueLength"] = 4000
+_large["queuePosition"] = 3217
+_large["currentTrack"]["title"] = "A very long track title " * 8
+_large["currentTrack"]["album"] = "A very long album title " * 8
+_large["currentTrack"]["metadata"] = {
+    f"desc_{index}": "SA_RINCON65031_X_#Svc65031-0-Token" * 4 for index in range(40)
+}
+_large["enqueuedMetadata"]["description"] = "Playlist description " * 50
+_large["groupMembers"] = [
+    {"uuid": f"RINCON_000E580000000014{index:02}", "name": f"Speaker {index}"}
+    for index in range(12)
+]
+LARGE_STATE = json.dumps(_large)
+
+STATES = {
+    "small": SMALL_STATE,
+    "typical": TYPICAL_STATE,
+    "large": LARGE_STATE,
+}
@@ -0,0 +1,140 @@
+"""Microbenchmarks for the hot paths of the integration.
+
+Run from the repository root (with Home Assistant installed):
+
+    python -m benchmarks.hot_paths [filter] [--json]
+
+For every benchmark the CPU time per call and the peak memory allocated
+during a single call are reported.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+from custom_components.mqtt_sonos.const import DISCOVERY_PAYLOAD, MQTT_PAYLOAD
+from custom_components.mqtt_sonos.media_player import (
+    seconds_to_time_string,
+    time_string_to_seconds,
+)
+from custom_components.mqtt_sonos.state_parser import parse_state_payload
+
+from .fixtures import DISCOVERY, STATES
+from .stubs import create_connection, create_entity, install_fake_mqtt, message
+
+NUMBER = 5000
+
+
+def _device_update(payload: str, changed: bool) -> Callable[[], Any]:
+    """Apply parsed state to an entity, optionally alternating the volume."""
+    entity = create_entity()
+    data = parse_state_payload(payload)
+    other = parse_state_payload(payload)
+    other["volume"] = {"Master": data["volume"]["Master"] + 1}
+    updates = [data, other] if changed else [data]
+    entity._handle_device_update(data)  # pylint: disable=protected-access
+    index = 0
+
+    def run() -> None:
+        nonlocal index
+        index += 1
+        entity._handle_device_update(  # pylint: disable=protected-access
+            updates[index % len(updates)]
+        )
+
+    return run
+
+
+def _hub_message(payload: str) -> Callable[[], Any]:
+    """Route a message through the state hub to a media player."""
+    entity = create_entity()
+    hub = entity._conn.state  # pylint: disable=protected-access
+    hub.async_add_listener(entity._handle_device_update)  # pylint: disable=protected-access
+    msg = message("sonos2mqtt/RINCON_000E58000000001400", payload)
+    return lambda: hub.async_message_received(msg)
+
+
+def _send_command(command: str, value: Any) -> Callable[[], Any]:
+    """Encode and publish a command to the fake mqtt client."""
+    fake = install_fake_mqtt()
+    conn = create_connection()
+    publish = conn._async_publish_command  # pylint: disable=protected-access
+
+    def run() -> None:
+        coro = publish(command, value)
+        try:
+            coro.send(None)
+        except StopIteration:
+            pass
+        fake.published.clear()
+
+    return run
+
+
+def benchmarks() -> dict[str, Callable[[], Any]]:
+    """Create all benchmarks."""
+    result: dict[str, Callable[[], Any]] = {}
+    for size, payload in STATES.items():
+        result[f"MQTT_PAYLOAD[{size}]"] = lambda p=payload: MQTT_PAYLOAD(p)
+        result[f"parse_state_payload[{size}]"] = lambda p=payload: parse_state_payload(
+            p
+        )
+        result[f"_handle_device_update[{size},changed]"] = _device_update(payload, True)
+        result[f"_handle_device_update[{size},unchanged]"] = _device_update(
+            payload, False
+        )
+        result[f"state_hub_message[{size}]"] = _hub_message(payload)
+    result["DISCOVERY_PAYLOAD"] = lambda: DISCOVERY_PAYLOAD(DISCOVERY)
+    result["time_string_to_seconds"] = lambda: time_string_to_seconds("1:02:01")
+    result["seconds_to_time_string"] = lambda: seconds_to_time_string(3721.0)
+    result["send_command[next]"] = _send_command("next", None)
+    result["send_command[notify]"] = _send_command(
+        "notify",
+        {
+            "trackUri": "https://cdn.smartersoft-group.com/various/pull-bell-short.mp3",
+            "timeout": 10,
+            "volume": 25,
+            "delayMs": 600,
+        },
+    )
+    return result
+
+
+def measure(func: Callable[[], Any], number: int = NUMBER) -> tuple[float, int]:
+    """Return CPU time per call in microseconds and peak bytes of one call."""
+    func()
+    start = time.process_time()
+    for _ in range(number):
+        func()
+    cpu = (time.process_time() - start) / number * 1e6
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    func()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def main(argv: list[str]) -> None:
+    """Run the benchmarks matching the optional filter."""
+    name_filter = next((arg for arg in argv if not arg.startswith("--")), "")
+    results = {}
+    print(f"{'benchmark':<45} {'cpu/call':>12} {'peak alloc':>12}")
+    for name, func in benchmarks().items():
+        if name_filter not in name:
+            continue
+        cpu, peak = measure(func)
+        results[name] = {"cpu_us": round(cpu, 2), "peak_bytes": peak}
+        print(f"{name:<45} {cpu:>9.2f} us {peak:>10} B")
+    if "--json" in argv:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
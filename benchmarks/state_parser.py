@@ -0,0 +1,31 @@
+"""Compare the fast state decoder with the MQTT_PAYLOAD schema.
+
+Run from the repository root (with Home Assistant installed):
+
+    python -m benchmarks.state_parser
+"""
+from __future__ import annotations
+
+import timeit
+
+from custom_components.mqtt_sonos.const import MQTT_PAYLOAD
+from custom_components.mqtt_sonos.state_parser import parse_state_payload
+
+from .fixtures import STATES
+
+
+def main(number: int = 20000) -> None:
+    """Time both parsers on each payload and print the speedup."""
+    for name, payload in STATES.items():
+        assert parse_state_payload(payload) == MQTT_PAYLOAD(payload)
+        schema = timeit.timeit(lambda: MQTT_PAYLOAD(payload), number=number)
+        fast = timeit.timeit(lambda: parse_state_payload(payload), number=number)
+        print(
+            f"{name:>10}: MQTT_PAYLOAD {schema / number * 1e6:8.2f} us"
+            f"  parse_state_payload {fast / number * 1e6:8.2f} us"
+            f"  ({schema / fast:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Offline stand-ins for the Home Assistant and mqtt parts used by the benchmarks."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.mqtt.models import ReceiveMessage
+
+from custom_components.mqtt_sonos import mqtt_media_connection
+from custom_components.mqtt_sonos.const import CONF_UPDATE_WINDOW, DISCOVERY_PAYLOAD
+from custom_components.mqtt_sonos.media_player import SonosMediaPlayerEntity
+from custom_components.mqtt_sonos.mqtt_media_connection import MqttMediaConnection
+
+from .fixtures import DISCOVERY
+
+
+class FakeConfigEntry:
+    """Config entry with just the fields used by the integration."""
+
+    entry_id = "benchmark"
+
+    def __init__(self, options: dict[str, Any] | None = None) -> None:
+        """Create config entry with options."""
+        self.options = options or {}
+
+
+class FakeHass:
+    """Home Assistant stand-in, the benchmarks never touch the state machine."""
+
+    def __init__(self) -> None:
+        """Create empty hass."""
+        self.data: dict[str, Any] = {}
+
+
+class FakeMqtt:
+    """Records published messages instead of sending them to a broker."""
+
+    def __init__(self) -> None:
+        """Create empty recorder."""
+        self.published: list[tuple[str, str]] = []
+
+    def is_connected(self, hass) -> bool:
+        """Pretend the broker is always connected."""
+        return True
+
+    async def async_publish(self, hass, topic: str, payload: str, qos: int = 0) -> None:
+        """Record a published message."""
+        self.published.append((topic, payload))
+
+
+def install_fake_mqtt() -> FakeMqtt:
+    """Replace the mqtt publish used by the connections."""
+    fake = FakeMqtt()
+    mqtt_media_connection.mqtt = fake
+    return fake
+
+
+def message(topic: str, payload: str) -> ReceiveMessage:
+    """Create a received mqtt message."""
+    return ReceiveMessage(topic, payload, 0, False, topic, None)
+
+
+def create_connection(hass: FakeHass | None = None) -> MqttMediaConnection:
+    """Create connection from the discovery fixture."""
+    return MqttMediaConnection(
+        hass or FakeHass(), FakeConfigEntry(), DISCOVERY_PAYLOAD(DISCOVERY)
+    )
+
+
+def create_entity() -> SonosMediaPlayerEntity:
+    """Create media player entity that writes its state to nowhere."""
+    hass = FakeHass()
+    conn = MqttMediaConnection(
+        hass, FakeConfigEntry({CONF_UPDATE_WINDOW: 0}), DISCOVERY_PAYLOAD(DISCOVERY)
+    )
+    entity = SonosMediaPlayerEntity(conn, hass)
+    entity.async_write_ha_state = lambda: None
+    return entity
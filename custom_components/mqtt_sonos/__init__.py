@@ -10,9 +10,10 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.device_registry import DeviceEntry
 
 from .const import DOMAIN
-from .sonos_manager import SonosManager
+from .favorites import async_remove_favorites_cache
+from .sonos_manager import SonosManager, async_remove_discovery_cache
 
-PLATFORMS: list[Platform] = [Platform.MEDIA_PLAYER]  # Platform.SWITCH
+PLATFORMS: list[Platform] = [Platform.MEDIA_PLAYER, Platform.SENSOR, Platform.SWITCH]
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,12 +32,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Call forward entry for home assistant to try to initialize the speakers.
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    # Speakers from the last run are created right away, without waiting for mqtt.
+    await manager.async_load_discovery_cache()
+    await manager.favorites.async_load()
+
     # We start discovery here so it's ready when the components are added.
     await manager.async_start_discovery()
 
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     return True
 
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when the options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
 
@@ -48,6 +60,12 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the discovery cache and favorites when the config entry is removed."""
+    await async_remove_discovery_cache(hass, entry)
+    await async_remove_favorites_cache(hass, entry)
+
+
 async def async_remove_config_entry_device(
     hass: HomeAssistant, config_entry: ConfigEntry, device_entry: DeviceEntry
 ) -> bool:
@@ -0,0 +1,52 @@
+"""Resolve announcement media once for all speakers that play it."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+from homeassistant.components import media_source
+from homeassistant.components.media_player import async_process_play_media_url
+from homeassistant.core import HomeAssistant
+
+ANNOUNCEMENT_TTL = 15  # seconds
+
+
+class AnnouncementResolver:
+    """Resolved announcement urls by media id, shared by all speakers.
+
+    Playing an announcement on a group of speakers calls each entity at the
+    same time, the first call resolves the media and the others wait for it.
+    """
+
+    def __init__(self, hass: HomeAssistant, ttl: float = ANNOUNCEMENT_TTL) -> None:
+        """Create empty resolver."""
+        self.hass = hass
+        self._ttl = ttl
+        self._items: dict[str, tuple[float, asyncio.Task[str]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def async_resolve(self, media_id: str, entity_id: str) -> str:
+        """Return the url the speakers can play for a media source id."""
+        now = time.monotonic()
+        self._items = {key: item for key, item in self._items.items() if item[0] >= now}
+        if (item := self._items.get(media_id)) is not None:
+            self.hits += 1
+            task = item[1]
+        else:
+            self.misses += 1
+            task = self.hass.async_create_task(self._async_resolve(media_id, entity_id))
+            self._items[media_id] = (now + self._ttl, task)
+        try:
+            # Shield the task, so a cancelled speaker does not cancel the others
+            return await asyncio.shield(task)
+        except Exception:
+            # Don't keep failed resolves, the next call should try again
+            if (item := self._items.get(media_id)) is not None and item[1] is task:
+                del self._items[media_id]
+            raise
+
+    async def _async_resolve(self, media_id: str, entity_id: str) -> str:
+        """Resolve the media source id to an url."""
+        info = await media_source.async_resolve_media(self.hass, media_id, entity_id)
+        return async_process_play_media_url(self.hass, info.url)
@@ -0,0 +1,49 @@
+"""Cache for media browser results, shared by all speakers."""
+from __future__ import annotations
+
+from collections import OrderedDict
+import time
+
+from homeassistant.components.media_player import BrowseMedia
+
+BROWSE_CACHE_TTL = 30  # seconds
+BROWSE_CACHE_SIZE = 64
+
+
+class BrowseCache:
+    """Browse results by media_content_id, with a time to live and LRU eviction."""
+
+    def __init__(
+        self, ttl: float = BROWSE_CACHE_TTL, max_size: int = BROWSE_CACHE_SIZE
+    ) -> None:
+        """Create empty cache."""
+        self._ttl = ttl
+        self._max_size = max_size
+        self._items: OrderedDict[str, tuple[float, BrowseMedia]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, media_content_id: str) -> BrowseMedia | None:
+        """Return the cached result, if it did not expire."""
+        if (item := self._items.get(media_content_id)) is None:
+            self.misses += 1
+            return None
+        expires, result = item
+        if expires < time.monotonic():
+            del self._items[media_content_id]
+            self.misses += 1
+            return None
+        self._items.move_to_end(media_content_id)
+        self.hits += 1
+        return result
+
+    def set(self, media_content_id: str, result: BrowseMedia) -> None:
+        """Store a result, removing the least recently used if the cache is full."""
+        self._items[media_content_id] = (time.monotonic() + self._ttl, result)
+        self._items.move_to_end(media_content_id)
+        while len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        self._items.clear()
@@ -6,20 +6,29 @@ from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
-from homeassistant.helpers.config_entry_flow import DiscoveryFlowHandler
 from homeassistant.helpers.service_info.mqtt import MqttServiceInfo
 
-from .const import DOMAIN
+from .const import (
+    CONF_DISTINCT_TOPICS,
+    CONF_METRICS,
+    CONF_MQTT_PREFIX,
+    CONF_UPDATE_WINDOW,
+    DEFAULT_MQTT_PREFIX,
+    DEFAULT_UPDATE_WINDOW,
+    DOMAIN,
+)
+from .sonos_manager import mqtt_prefix
 
 _LOGGER = logging.getLogger(__name__)
 
 
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
-        vol.Required("mqtt_prefix"): str,
+        vol.Required(CONF_MQTT_PREFIX, default=DEFAULT_MQTT_PREFIX): str,
     }
 )
 
@@ -66,60 +75,112 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
 #     return {"mqtt_prefix": data["mqtt_prefix"]}
 
 
-async def _async_has_devices(hass: HomeAssistant) -> bool:
-    """Return if Sonos devices have been seen by mqtt."""
-    _LOGGER.debug("_async_has_devices is called")
-    return True
-
-
-class Sonos2MqttConfigFlow(DiscoveryFlowHandler, domain=DOMAIN):
-    """Handle a config flow for Sonos over mqtt."""
+class Sonos2MqttConfigFlow(ConfigFlow, domain=DOMAIN):
+    """Handle a config flow for Sonos over mqtt, one entry per bridge."""
 
     VERSION = 1
 
     def __init__(self) -> None:
-        """Init discovery flow."""
-        super().__init__(DOMAIN, "Sonos2mqtt", _async_has_devices)
+        """Init config flow."""
+        self._prefix = DEFAULT_MQTT_PREFIX
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Create the options flow."""
+        return Sonos2MqttOptionsFlow(config_entry)
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle the initial step."""
-        if self._async_current_entries():
-            return self.async_abort(reason="single_instance_allowed")
-        # if user_input is None:
-        #     return self.async_show_form(
-        #         step_id="user", data_schema=STEP_USER_DATA_SCHEMA
-        #     )
-
-        # errors = {}
-        return await self.async_step_confirm()
-        # return self.async_create_entry(title="Instance", data=user_input)
-
-        # try:
-        #     info = await validate_input(self.hass, user_input)
-        # # except CannotConnect:
-        # #     errors["base"] = "cannot_connect"
-        # # except InvalidAuth:
-        # #     errors["base"] = "invalid_auth"
-        # except Exception:  # pylint: disable=broad-except
-        #     _LOGGER.exception("Unexpected exception")
-        #     errors["base"] = "unknown"
-        # else:
-        #     return self.async_create_entry(title="Instance", data=user_input)
-
-        # return self.async_show_form(
-        #     step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
-        # )
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            prefix = user_input[CONF_MQTT_PREFIX].strip().strip("/")
+            if not prefix or "+" in prefix or "#" in prefix:
+                errors[CONF_MQTT_PREFIX] = "invalid_prefix"
+            else:
+                if abort := await self._async_set_prefix(prefix):
+                    return abort
+                return self._async_create_bridge_entry()
+
+        return self.async_show_form(
+            step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
+        )
 
     async def async_step_mqtt(self, discovery_info: MqttServiceInfo) -> FlowResult:
         """Handle mqtt auto discovery."""
         # Triggered if this component is installed and it finds mqtt messages described in the manifest
-        if self._async_current_entries() or self._async_in_progress():
-            return self.async_abort(reason="single_instance_allowed")
-        await self.async_set_unique_id(DOMAIN)
+        prefix = discovery_info.topic.partition("/discovery/")[0]
+        if abort := await self._async_set_prefix(prefix):
+            return abort
+        self.context["title_placeholders"] = {CONF_MQTT_PREFIX: prefix}
         return await self.async_step_confirm()
-        # return self.async_create_entry(title="Instance", data={})
+
+    async def async_step_confirm(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Confirm the discovered bridge."""
+        if user_input is None:
+            self._set_confirm_only()
+            return self.async_show_form(
+                step_id="confirm",
+                description_placeholders={CONF_MQTT_PREFIX: self._prefix},
+            )
+        return self._async_create_bridge_entry()
+
+    async def _async_set_prefix(self, prefix: str) -> FlowResult | None:
+        """Use the prefix as unique id, returns abort result if it is configured."""
+        # Entries created before multiple bridges were supported have no prefix
+        for entry in self._async_current_entries(include_ignore=False):
+            if mqtt_prefix(entry) == prefix:
+                return self.async_abort(reason="already_configured")
+        self._prefix = prefix
+        await self.async_set_unique_id(prefix)
+        self._abort_if_unique_id_configured()
+        return None
+
+    @callback
+    def _async_create_bridge_entry(self) -> FlowResult:
+        """Create the config entry of the bridge."""
+        return self.async_create_entry(
+            title=self._prefix, data={CONF_MQTT_PREFIX: self._prefix}
+        )
+
+
+class Sonos2MqttOptionsFlow(OptionsFlow):
+    """Handle the options for Sonos over mqtt."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Init options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_UPDATE_WINDOW,
+                        default=options.get(CONF_UPDATE_WINDOW, DEFAULT_UPDATE_WINDOW),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1000)),
+                    vol.Required(
+                        CONF_DISTINCT_TOPICS,
+                        default=options.get(CONF_DISTINCT_TOPICS, False),
+                    ): bool,
+                    vol.Required(
+                        CONF_METRICS, default=options.get(CONF_METRICS, False)
+                    ): bool,
+                }
+            ),
+        )
 
 
 class CannotConnect(HomeAssistantError):
@@ -10,6 +10,13 @@ import homeassistant.helpers.config_validation as cv
 
 DOMAIN = "mqtt_sonos"
 
+CONF_DISTINCT_TOPICS = "distinct_topics"
+CONF_METRICS = "metrics"
+CONF_MQTT_PREFIX = "mqtt_prefix"
+CONF_UPDATE_WINDOW = "update_window"
+DEFAULT_UPDATE_WINDOW = 150  # milliseconds
+DEFAULT_MQTT_PREFIX = "sonos2mqtt"
+
 ATTR_AVAILABILITY_TOPIC = "availability_topic"
 ATTR_COMMAND_TOPIC = "command_topic"
 ATTR_DEVICE = "device"
@@ -50,6 +57,7 @@ ATTR_TRACK_ARTIST = "artist"
 ATTR_TRACK_DURATION = "duration"
 ATTR_TRACK_URI = "trackUri"
 
+# Sent with the entry id appended, so each entry only adds its own speakers
 EVENT_DISCOVERED = DOMAIN + ".discovered"
 
 REPEAT_OFF = "Off"
@@ -134,6 +142,7 @@ MQTT_PAYLOAD = vol.Schema(
 
 DEFAULT_SPEAKER_FEATURES = (
     MediaPlayerEntityFeature.BROWSE_MEDIA
+    | MediaPlayerEntityFeature.GROUPING
     | MediaPlayerEntityFeature.NEXT_TRACK
     | MediaPlayerEntityFeature.PAUSE
     | MediaPlayerEntityFeature.PLAY
@@ -0,0 +1,103 @@
+"""Request and reply correlation for sonos2mqtt commands that return data."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
+
+from homeassistant.components.mqtt.models import ReceiveMessage
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .subscriptions import SubscriptionRegistry
+
+if TYPE_CHECKING:
+    from .mqtt_media_connection import MqttMediaConnection
+
+_LOGGER = logging.getLogger(__name__)
+
+# sonos2mqtt publishes the result of a command to <prefix>/<reply>
+REPLY_TOPIC = "reply/{}"
+REQUEST_TIMEOUT = 10  # seconds
+
+
+class RequestCorrelator:
+    """Match replies to the requests of all speakers of a bridge.
+
+    Every request gets its own reply topic with a correlation id, all reply
+    topics are received through one wildcard subscription. Subscribe when
+    discovery starts: mqtt sends subscriptions after a cooldown, a reply to
+    the first request could be missed if it subscribed on that request.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, prefix: str, subscriptions: SubscriptionRegistry
+    ) -> None:
+        """Create correlator without pending requests."""
+        self.hass = hass
+        self._prefix = prefix
+        self._subscriptions = subscriptions
+        self._pending: dict[str, asyncio.Future[Any]] = {}
+        self.replies = 0
+        self.timeouts = 0
+
+    async def async_subscribe(self) -> None:
+        """Subscribe to the reply topics, call when discovery starts."""
+        await self._subscriptions.async_subscribe(
+            f"{self._prefix}/{REPLY_TOPIC.format('+')}", self._async_reply_received
+        )
+
+    @callback
+    def _async_reply_received(self, msg: ReceiveMessage) -> None:
+        """Resolve the request of the correlation id in the topic."""
+        correlation_id = msg.topic.rpartition("/")[2]
+        if (future := self._pending.pop(correlation_id, None)) is None:
+            _LOGGER.debug("Ignoring reply without request on %s", msg.topic)
+            return
+        if future.done():
+            return
+        try:
+            result = json.loads(msg.payload)
+        except ValueError:
+            result = msg.payload
+        self.replies += 1
+        future.set_result(result)
+
+    async def async_request(
+        self,
+        conn: MqttMediaConnection,
+        command: str,
+        value: dict[str, Any],
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> Any:
+        """Send a command with a reply topic and return the decoded reply."""
+        correlation_id = uuid4().hex
+        future: asyncio.Future[Any] = self.hass.loop.create_future()
+        self._pending[correlation_id] = future
+        try:
+            await conn.send_command(
+                command, {**value, "reply": REPLY_TOPIC.format(correlation_id)}
+            )
+            async with asyncio.timeout(timeout):
+                return await future
+        except TimeoutError as error:
+            self.timeouts += 1
+            raise HomeAssistantError(
+                f"No reply from {conn.name} to {command} within {timeout} seconds"
+            ) from error
+        finally:
+            self._pending.pop(correlation_id, None)
+
+    @callback
+    def async_cancel_all(self) -> None:
+        """Cancel all pending requests, call on unload."""
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    @property
+    def pending(self) -> int:
+        """Return the number of requests waiting for a reply."""
+        return len(self._pending)
@@ -0,0 +1,58 @@
+"""Diagnostics support for Sonos over mqtt."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .metrics import collect_state_writes
+from .sonos_manager import SonosManager
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    manager: SonosManager = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "mqtt_prefix": manager.prefix,
+        "options": dict(entry.options),
+        "speakers": {
+            uuid: {
+                "name": conn.name,
+                "state_topic": conn.state_topic,
+                "command_topic": conn.command_topic,
+                "buffered_commands": conn.offline_depth,
+                "queue": {
+                    "length": conn.queue.length,
+                    "cached_pages": conn.queue.cached_pages,
+                    "hits": conn.queue.hits,
+                    "fetches": conn.queue.fetches,
+                },
+            }
+            for uuid, conn in manager.get_connections().items()
+        },
+        "state_writes": collect_state_writes(hass, entry),
+        "favorites_fetches": manager.favorites.fetches,
+        "browse_cache": {
+            "hits": manager.browse_cache.hits,
+            "misses": manager.browse_cache.misses,
+        },
+        "announcements": {
+            "hits": manager.announcements.hits,
+            "misses": manager.announcements.misses,
+        },
+        "subscriptions": {
+            "count": manager.subscriptions.count,
+            "topics": manager.subscriptions.topics,
+        },
+        "requests": {
+            "pending": manager.correlator.pending,
+            "replies": manager.correlator.replies,
+            "timeouts": manager.correlator.timeouts,
+        },
+        "ingest": manager.ingest.as_dict(),
+        "metrics": manager.metrics.as_dict() if manager.metrics else None,
+    }
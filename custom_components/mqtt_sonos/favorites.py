@@ -0,0 +1,232 @@
+"""Sonos favorites and playlists, shared by all speakers of a bridge."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.media_player import (
+    BrowseError,
+    BrowseMedia,
+    MediaClass,
+    MediaType,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from .mqtt_media_connection import MqttMediaConnection
+
+_LOGGER = logging.getLogger(__name__)
+
+FAVORITES_ID = "sonos2mqtt://favorites"
+PLAYLISTS_ID = "sonos2mqtt://playlists"
+FAVORITE_ITEM_ID = "sonos2mqtt://favorite/"
+
+# Content directory containers, by browse id
+CONTAINERS = {FAVORITES_ID: "FV:2", PLAYLISTS_ID: "SQ:"}
+TITLES = {FAVORITES_ID: "Favorites", PLAYLISTS_ID: "Playlists"}
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 10  # seconds
+# Cached items are shown right away, and checked for changes after this time
+REFRESH_INTERVAL = 60  # seconds
+FETCH_PAGE_SIZE = 100
+
+
+class FavoritesCache:
+    """Favorites and playlists of the household of a bridge.
+
+    Loaded from storage on startup. Browsing shows the cached items and
+    checks the UpdateID of the container in the background, the items are
+    only fetched again when it changed.
+    """
+
+    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+        """Create empty cache."""
+        self.hass = hass
+        self._store = _favorites_store(hass, config_entry)
+        # Container to its UpdateID and items
+        self._containers: dict[str, dict[str, Any]] = {}
+        self._items: dict[str, dict[str, Any]] = {}
+        self._checked: dict[str, float] = {}
+        self._refreshing: dict[str, asyncio.Task[None]] = {}
+        self.fetches = 0
+
+    async def async_load(self) -> None:
+        """Load the favorites of the last run."""
+        if (data := await self._store.async_load()) is None:
+            return
+        self._containers = data
+        self._async_index_items()
+
+    @callback
+    def _async_index_items(self) -> None:
+        """Index all items by their media id."""
+        self._items = {
+            f"{FAVORITE_ITEM_ID}{item['ItemId']}": item
+            for container in self._containers.values()
+            for item in container["items"]
+            if item.get("ItemId")
+        }
+
+    def item(self, media_content_id: str) -> dict[str, Any] | None:
+        """Return a cached favorite or playlist by media id."""
+        return self._items.get(media_content_id)
+
+    async def async_browse(
+        self, conn: MqttMediaConnection, media_content_id: str
+    ) -> BrowseMedia:
+        """Browse favorites or playlists, fetched with the connection if needed."""
+        if (container := CONTAINERS.get(media_content_id)) is None:
+            raise BrowseError(f"Media not found: {media_content_id}")
+
+        if container not in self._containers:
+            await self._async_refresh(conn, container)
+        elif time.monotonic() - self._checked.get(container, 0) > REFRESH_INTERVAL:
+            self._async_schedule_refresh(conn, container)
+
+        items = self._containers.get(container, {}).get("items", [])
+        return BrowseMedia(
+            title=TITLES[media_content_id],
+            media_class=MediaClass.DIRECTORY,
+            media_content_id=media_content_id,
+            media_content_type=MediaType.PLAYLIST,
+            can_play=False,
+            can_expand=True,
+            children_media_class=MediaClass.PLAYLIST,
+            children=[
+                BrowseMedia(
+                    title=item.get("Title") or "Unknown",
+                    media_class=MediaClass.PLAYLIST,
+                    media_content_id=f"{FAVORITE_ITEM_ID}{item['ItemId']}",
+                    media_content_type=MediaType.PLAYLIST,
+                    can_play=True,
+                    can_expand=False,
+                    thumbnail=item.get("AlbumArtUri"),
+                )
+                for item in items
+                if item.get("ItemId")
+            ],
+        )
+
+    @callback
+    def _async_schedule_refresh(
+        self, conn: MqttMediaConnection, container: str
+    ) -> None:
+        """Check a container for changes in the background."""
+        if container in self._refreshing:
+            return
+
+        async def async_refresh() -> None:
+            try:
+                await self._async_refresh(conn, container)
+            except HomeAssistantError as error:
+                _LOGGER.debug("Refreshing %s failed: %s", container, error)
+            finally:
+                self._refreshing.pop(container, None)
+
+        self._refreshing[container] = self.hass.async_create_background_task(
+            async_refresh(), f"{DOMAIN} refresh {container}"
+        )
+
+    async def _async_refresh(self, conn: MqttMediaConnection, container: str) -> None:
+        """Fetch the items of a container, if its UpdateID changed."""
+        self._checked[container] = time.monotonic()
+        # The first item is enough to compare the UpdateID
+        first = await _async_browse(conn, container, 0, 1)
+        cached = self._containers.get(container)
+        if cached is not None and cached["update_id"] == first.get("UpdateID"):
+            return
+
+        self.fetches += 1
+        items: list[dict[str, Any]] = []
+        total = int(first.get("TotalMatches") or 0)
+        while len(items) < total:
+            reply = await _async_browse(conn, container, len(items), FETCH_PAGE_SIZE)
+            if not (page := _result_items(reply)):
+                break
+            items.extend(page)
+
+        _LOGGER.debug("Fetched %d items of %s", len(items), container)
+        self._containers[container] = {
+            "update_id": first.get("UpdateID"),
+            "items": items,
+        }
+        self._async_index_items()
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, dict[str, Any]]:
+        """Return the favorites to store."""
+        return self._containers
+
+    @callback
+    def async_cancel(self) -> None:
+        """Cancel the background refreshes, call on unload."""
+        for task in self._refreshing.values():
+            task.cancel()
+        self._refreshing.clear()
+
+
+def favorites_root_nodes() -> list[BrowseMedia]:
+    """Create the favorites and playlists nodes for the root of the media browser."""
+    return [
+        BrowseMedia(
+            title=title,
+            media_class=MediaClass.DIRECTORY,
+            media_content_id=media_content_id,
+            media_content_type=MediaType.PLAYLIST,
+            can_play=False,
+            can_expand=True,
+        )
+        for media_content_id, title in TITLES.items()
+    ]
+
+
+async def _async_browse(
+    conn: MqttMediaConnection, container: str, start: int, count: int
+) -> dict[str, Any]:
+    """Browse a content directory container with an adv-command request."""
+    reply = await conn.async_request(
+        "adv-command",
+        {
+            "cmd": "ContentDirectoryService.BrowseParsed",
+            "val": {
+                "ObjectID": container,
+                "BrowseFlag": "BrowseDirectChildren",
+                "Filter": "*",
+                "StartingIndex": start,
+                "RequestedCount": count,
+                "SortCriteria": "",
+            },
+        },
+    )
+    if not isinstance(reply, dict):
+        raise BrowseError(f"Unexpected reply browsing {container}")
+    return reply
+
+
+def _result_items(reply: dict[str, Any]) -> list[dict[str, Any]]:
+    """Return the items of a browse reply, a single item is not sent as a list."""
+    items = reply.get("Result") or []
+    return [items] if isinstance(items, dict) else items
+
+
+async def async_remove_favorites_cache(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> None:
+    """Remove the persisted favorites of a config entry."""
+    await _favorites_store(hass, config_entry).async_remove()
+
+
+def _favorites_store(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> Store[dict[str, dict[str, Any]]]:
+    """Create the store for the favorites of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{config_entry.entry_id}.favorites")
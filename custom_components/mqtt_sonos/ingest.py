@@ -0,0 +1,109 @@
+"""Ingest queue for incoming mqtt messages."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+from typing import Any
+
+from homeassistant.components.mqtt.models import ReceiveMessage
+from homeassistant.core import HomeAssistant, callback
+
+_LOGGER = logging.getLogger(__name__)
+
+INGEST_QUEUE_SIZE = 512  # topics
+INGEST_SLICE_SIZE = 20  # messages per event loop iteration
+
+MessageHandler = Callable[[ReceiveMessage], None]
+
+
+class IngestQueue:
+    """Latest pending message per topic, handled in slices on the event loop.
+
+    After a broker or bridge restart all retained messages arrive at once,
+    handling them in slices keeps the event loop responsive. A newer message
+    replaces a pending message of the same topic, when the queue is full the
+    oldest pending message is dropped. Messages that are not sent again, like
+    retained discovery messages, are queued in a separate lane that is never
+    dropped and handled first.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        max_size: int = INGEST_QUEUE_SIZE,
+        slice_size: int = INGEST_SLICE_SIZE,
+    ) -> None:
+        """Create empty ingest queue."""
+        self.hass = hass
+        self._max_size = max_size
+        self._slice_size = slice_size
+        self._pending: dict[str, tuple[MessageHandler, ReceiveMessage]] = {}
+        self._kept: dict[str, tuple[MessageHandler, ReceiveMessage]] = {}
+        self._scheduled: asyncio.Handle | None = None
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @callback
+    def async_put(
+        self, handler: MessageHandler, msg: ReceiveMessage, keep: bool = False
+    ) -> None:
+        """Queue a message, replacing a pending message of the same topic.
+
+        Messages queued with keep are never dropped when the queue is full.
+        """
+        self.received += 1
+        pending = self._kept if keep else self._pending
+        if msg.topic in pending:
+            # Keeps the place in the queue, with the newer message
+            self.coalesced += 1
+        elif not keep and len(pending) >= self._max_size:
+            del pending[next(iter(pending))]
+            self.dropped += 1
+        pending[msg.topic] = (handler, msg)
+        self.max_depth = max(self.max_depth, self.depth)
+
+        if self._scheduled is None:
+            self._scheduled = self.hass.loop.call_soon(self._async_process)
+
+    @callback
+    def _async_process(self) -> None:
+        """Handle a slice of the pending messages."""
+        self._scheduled = None
+        for _ in range(min(self._slice_size, self.depth)):
+            pending = self._kept or self._pending
+            topic = next(iter(pending))
+            handler, msg = pending.pop(topic)
+            try:
+                handler(msg)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error handling message on %s", topic)
+
+        if self.depth:
+            self._scheduled = self.hass.loop.call_soon(self._async_process)
+
+    @callback
+    def async_clear(self) -> None:
+        """Drop all pending messages, call on unload."""
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+        self._pending.clear()
+        self._kept.clear()
+
+    @property
+    def depth(self) -> int:
+        """Return the number of pending messages."""
+        return len(self._pending) + len(self._kept)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return queue counters for diagnostics."""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
@@ -3,12 +3,13 @@ from __future__ import annotations
 
 import datetime as dt
 import logging
+from operator import attrgetter
 import time
 from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.components import media_source, mqtt
+from homeassistant.components import media_source
 from homeassistant.components.media_player import (
     ATTR_MEDIA_ENQUEUE,
     ATTR_MEDIA_VOLUME_LEVEL,
@@ -21,16 +22,17 @@ from homeassistant.components.media_player import (
     MediaPlayerState,
     MediaType,
     RepeatMode,
-    async_process_play_media_url,
     _rename_keys,
 )
-from homeassistant.components.mqtt.models import ReceiveMessage
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback  # , ServiceCall
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback  # , ServiceCall
 
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_validation as cv, entity_platform  # , service
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
 
 from .const import (
     ATTR_CHANNEL_MASTER,
@@ -49,11 +51,13 @@ from .const import (
     ATTR_TRACK_URI,
     ATTR_TRANSPORTSTATE,
     ATTR_UPNP_CLASS,
+    ATTR_UUID,
     ATTR_VOLUME,
+    CONF_UPDATE_WINDOW,
     DEFAULT_SPEAKER_FEATURES,
-    # DOMAIN,
+    DEFAULT_UPDATE_WINDOW,
+    DOMAIN,
     EVENT_DISCOVERED,
-    MQTT_PAYLOAD,
     REPEAT_ALL,
     REPEAT_OFF,
     REPEAT_ONE,
@@ -62,9 +66,17 @@ from .const import (
     SOURCE_QUEUE,
     SOURCE_TV,
 )
-from .mqtt_media_connection import MqttMediaConnection
-
-# from .sonos_manager import SonosManager
+from .favorites import CONTAINERS, favorites_root_nodes
+from .mqtt_media_connection import MqttMediaConnection, async_send_command_batch
+from .optimistic import PendingCommands
+from .queue_browser import (
+    QUEUE_ID,
+    async_browse_queue,
+    queue_root_node,
+    queue_track_index,
+)
+from .sonos_manager import SonosManager
+from .state_parser import REPEAT_MODES, TRANSPORT_STATES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -80,6 +92,33 @@ SERVICE_GROUP_VOLUME = "group_volume"
 SERVICE_GROUP_VOLUME_DOWN = SERVICE_GROUP_VOLUME + "_down"
 SERVICE_GROUP_VOLUME_UP = SERVICE_GROUP_VOLUME + "_up"
 
+# Position updates within this many seconds of the extrapolated position are ignored
+POSITION_TOLERANCE = 1.5
+CLOCK_OFFSET_SMOOTHING = 0.1
+
+# All attributes set from state messages, used to detect changes.
+_STATE_SNAPSHOT = attrgetter(
+    "_attr_available",
+    "_attr_state",
+    "_attr_media_title",
+    "_attr_media_album_name",
+    "_attr_media_image_url",
+    "_attr_media_image_remotely_accessible",
+    "_attr_media_artist",
+    "_attr_media_album_artist",
+    "_attr_media_content_id",
+    "_attr_source",
+    "_attr_media_duration",
+    "_attr_media_playlist",
+    "_attr_volume_level",
+    "_attr_is_volume_muted",
+    "_attr_shuffle",
+    "_attr_repeat",
+    "_attr_media_position",
+    "_attr_media_position_updated_at",
+    "_attr_group_members",
+)
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -103,13 +142,18 @@ async def async_setup_entry(
 
     # Register for later updates
     @callback
-    def event_create_entity(connection: MqttMediaConnection) -> None:
+    def event_create_entity(connections: list[MqttMediaConnection]) -> None:
         """Add entities once they are discovered"""
-        _LOGGER.debug("Adding MediaPlayer with name %s", connection.name)
-        async_add_entries([SonosMediaPlayerEntity(connection, hass)], False)
+        _LOGGER.debug("Adding %d MediaPlayers", len(connections))
+        async_add_entries(
+            [SonosMediaPlayerEntity(connection, hass) for connection in connections],
+            False,
+        )
 
     config_entry.async_on_unload(
-        async_dispatcher_connect(hass, EVENT_DISCOVERED, event_create_entity)
+        async_dispatcher_connect(
+            hass, f"{EVENT_DISCOVERED}_{config_entry.entry_id}", event_create_entity
+        )
     )
     # Adding extra service calls here
     platform.async_register_entity_service(
@@ -179,43 +223,87 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
         self._attr_available = True
         self._attr_source_list = conn.source_list
 
+        # Changes within this window (in seconds) are written as one state
+        self._update_window = (
+            conn.config_entry.options.get(CONF_UPDATE_WINDOW, DEFAULT_UPDATE_WINDOW)
+            / 1000
+        )
+        self._cancel_pending_write: CALLBACK_TYPE | None = None
+        self._clock_offset: float | None = None
+        self._pending = PendingCommands()
+
+        # Counters for state writes from mqtt messages
+        self.state_writes = 0
+        self.suppressed_writes = 0
+        self.coalesced_writes = 0
+
+    @property
+    def _manager(self) -> SonosManager:
+        """Return the manager of the config entry of this speaker."""
+        return self.hass.data[DOMAIN][self._conn.config_entry.entry_id]
+
     async def async_added_to_hass(self) -> None:
         """Automatically called if entity is activated."""
 
         _LOGGER.debug("async_added_to_hass called for %s", self._attr_unique_id)
 
-        @callback
-        def message_received(msg: ReceiveMessage) -> None:
-            """Handle update from mqtt."""
-            try:
-                data = MQTT_PAYLOAD(msg.payload)
-            except vol.MultipleInvalid as error:
-                _LOGGER.warning(
-                    "Skipping update because of malformatted data: %s", error
-                )
-                return
+        self._manager.entity_connections[self.entity_id] = self._conn
+        self._conn.media_player_entity_id = self.entity_id
 
-            self._handle_device_update(data)
-
-        await mqtt.async_subscribe(self.hass, self._conn.state_topic, message_received)
+        self.async_on_remove(
+            self._conn.state.async_add_listener(self._handle_device_update)
+        )
+        self.async_on_remove(
+            self._conn.async_add_listener(self._handle_connection_update)
+        )
         if self._attr_available is False:
             self._attr_available = True
             self.async_write_ha_state()
 
-    def _handle_device_update(self, data: MQTT_PAYLOAD) -> None:
+    @callback
+    def _handle_connection_update(self) -> None:
+        """Apply changed discovery info without recreating the entity."""
+        if self._conn.removed:
+            self.hass.async_create_task(self.async_remove(force_remove=True))
+            return
+        self._attr_device_info = self._conn.device_info
+        self._attr_source_list = self._conn.source_list
+        self.async_write_ha_state()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel pending state write when entity is removed."""
+        self._manager.entity_connections.pop(self.entity_id, None)
+        self._conn.media_player_entity_id = None
+        if self._cancel_pending_write is not None:
+            self._cancel_pending_write()
+            self._cancel_pending_write = None
+
+    @callback
+    def _async_write_pending_state(self, _now: dt.datetime | None = None) -> None:
+        """Write the state collected from mqtt messages."""
+        if self._cancel_pending_write is not None:
+            self._cancel_pending_write()
+            self._cancel_pending_write = None
+        self.state_writes += 1
+        self.async_write_ha_state()
+
+    @callback
+    def _handle_device_update(self, data: dict[str, Any]) -> None:
         """Update data from mqtt message."""
 
         # _LOGGER.debug("Got update from mqtt %s %s", self._attr_unique_id, data)
 
+        previous = _STATE_SNAPSHOT(self)
+        previous_state = self._attr_state
+        # Track, position and transport state come from the group coordinator
+        playback = self._conn.state.playback_data(data)
         self._attr_available = True
-        state = data[ATTR_TRANSPORTSTATE]
-        if state in ("PAUSED_PLAYBACK", "STOPPED"):
-            self._attr_state = MediaPlayerState.PAUSED
-        else:
-            self._attr_state = MediaPlayerState.PLAYING
+        self._attr_state = TRANSPORT_STATES.get(
+            playback[ATTR_TRANSPORTSTATE], MediaPlayerState.PLAYING
+        )
 
-        if ATTR_CURRENT_TRACK in data:
-            track = data[ATTR_CURRENT_TRACK]
+        if ATTR_CURRENT_TRACK in playback:
+            track = playback[ATTR_CURRENT_TRACK]
             if ATTR_TITLE in track:
                 self._attr_media_title = track[ATTR_TITLE]
 
@@ -257,8 +345,8 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
             else:
                 self._attr_media_duration = None
 
-        if ATTR_ENQUEUED_METADATA in data:
-            meta = data[ATTR_ENQUEUED_METADATA]
+        if ATTR_ENQUEUED_METADATA in playback:
+            meta = playback[ATTR_ENQUEUED_METADATA]
             if ATTR_TITLE in meta:
                 self._attr_media_playlist = meta[ATTR_TITLE]
             if ATTR_UPNP_CLASS in meta and meta[ATTR_UPNP_CLASS].startswith(
@@ -279,34 +367,110 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
             self._attr_shuffle = data[ATTR_SHUFFLE]
 
         if ATTR_REPEAT in data:
-            repeat = data[ATTR_REPEAT]
-            if repeat == REPEAT_ALL:
-                self._attr_repeat = RepeatMode.ALL
-            elif repeat == REPEAT_ONE:
-                self._attr_repeat = RepeatMode.ONE
-            else:
-                self._attr_repeat = RepeatMode.OFF
+            self._attr_repeat = REPEAT_MODES.get(data[ATTR_REPEAT], RepeatMode.OFF)
+
+        if (index := self._conn.state.group_index) is not None:
+            self._attr_group_members = [
+                entity_id
+                for uuid in index.group_members(data[ATTR_UUID])
+                if (hub := index.hubs.get(uuid)) is not None
+                and (entity_id := hub.connection.media_player_entity_id) is not None
+            ]
+
+        if ATTR_POSITION in playback:
+            self._update_position(playback[ATTR_POSITION], previous_state)
+        elif self._attr_state != previous_state:
+            self._extrapolate_position(previous_state)
+
+        # Keep showing the effect of commands the speaker did not confirm yet
+        self._pending.reconcile(self, self._conn.state.metrics)
+
+        # Retained and repeated messages should not result in a new state
+        if _STATE_SNAPSHOT(self) == previous:
+            self.suppressed_writes += 1
+            return
 
-        if ATTR_POSITION in data:
-            self._attr_media_position = time_string_to_seconds(
-                data[ATTR_POSITION][ATTR_POSITION]
-            )
-            self._attr_media_position_updated_at = dt.datetime.fromtimestamp(
-                data[ATTR_POSITION][ATTR_POSITION_LAST_UPDATE] / 1000, dt.timezone.utc
+        # Transport changes go out right away to keep the controls responsive,
+        # other changes in a burst of messages are combined in one state write.
+        if self._update_window == 0 or self._attr_state != previous_state:
+            self._async_write_pending_state()
+        elif self._cancel_pending_write is None:
+            self._cancel_pending_write = async_call_later(
+                self.hass, self._update_window, self._async_write_pending_state
             )
+        else:
+            self.coalesced_writes += 1
 
-        self.async_write_ha_state()
+    def _update_position(
+        self, position: dict[str, Any], previous_state: MediaPlayerState | None
+    ) -> None:
+        """Update the position, unless it matches the extrapolated position.
+
+        The frontend extrapolates the position of a playing speaker, so the
+        bridge can publish the position much less often without drift.
+        """
+        now = dt_util.utcnow().timestamp()
+        last_update = position[ATTR_POSITION_LAST_UPDATE] / 1000
+
+        # Offset between our clock and the clock of the bridge, it includes the
+        # message latency, so it follows decreases right away and increases slowly.
+        offset = now - last_update
+        if self._clock_offset is None or offset < self._clock_offset:
+            self._clock_offset = offset
+        else:
+            self._clock_offset += (offset - self._clock_offset) * CLOCK_OFFSET_SMOOTHING
+        updated_at = min(last_update + self._clock_offset, now)
+
+        seconds = time_string_to_seconds(position[ATTR_POSITION])
+        if (
+            seconds is not None
+            and self._attr_media_position is not None
+            and self._attr_media_position_updated_at is not None
+            and self._attr_state == previous_state
+        ):
+            expected = self._attr_media_position
+            if self._attr_state == MediaPlayerState.PLAYING:
+                expected += (
+                    updated_at - self._attr_media_position_updated_at.timestamp()
+                )
+            if abs(expected - seconds) <= POSITION_TOLERANCE:
+                return
+
+        self._attr_media_position = seconds
+        self._attr_media_position_updated_at = dt.datetime.fromtimestamp(
+            updated_at, dt.timezone.utc
+        )
+
+    def _extrapolate_position(self, previous_state: MediaPlayerState | None) -> None:
+        """Move the position along after a transport change without a position."""
+        if (
+            self._attr_media_position is None
+            or self._attr_media_position_updated_at is None
+        ):
+            return
+        now = dt_util.utcnow()
+        if previous_state == MediaPlayerState.PLAYING:
+            self._attr_media_position += (
+                now - self._attr_media_position_updated_at
+            ).total_seconds()
+        self._attr_media_position_updated_at = now
 
     async def async_media_play(self) -> None:
         """Send play command to mqtt."""
         await self._conn.send_command("play")
-        self._attr_state = MediaPlayerState.BUFFERING
+        self._pending.expect(
+            self,
+            "play",
+            "_attr_state",
+            MediaPlayerState.PLAYING,
+            shown=MediaPlayerState.BUFFERING,
+        )
         self.async_write_ha_state()
 
     async def async_media_pause(self) -> None:
         """Send pause command to mqtt."""
         await self._conn.send_command("pause")
-        self._attr_state = MediaPlayerState.PAUSED
+        self._pending.expect(self, "pause", "_attr_state", MediaPlayerState.PAUSED)
         self.async_write_ha_state()
 
     async def async_media_play_pause(self) -> None:
@@ -328,7 +492,7 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
     async def async_mute_volume(self, mute: bool) -> None:
         """Send mute command to mqtt."""
         await self._conn.send_command("mute", mute)
-        self._attr_is_volume_muted = mute
+        self._pending.expect(self, "mute", "_attr_is_volume_muted", mute)
         self.async_write_ha_state()
 
     async def async_set_repeat(self, repeat: RepeatMode) -> None:
@@ -339,41 +503,48 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
             await self._conn.send_command("repeat", REPEAT_ONE)
         elif repeat == RepeatMode.OFF:
             await self._conn.send_command("repeat", REPEAT_OFF)
-        self._attr_repeat = repeat
+        self._pending.expect(self, "repeat", "_attr_repeat", repeat)
         self.async_write_ha_state()
 
     async def async_set_shuffle(self, shuffle: bool) -> None:
         """Send shuffle to mqtt."""
         await self._conn.send_command("shuffle", shuffle)
-        self._attr_shuffle = shuffle
+        self._pending.expect(self, "shuffle", "_attr_shuffle", shuffle)
         self.async_write_ha_state()
 
     async def async_set_volume_level(self, volume: float) -> None:
         """Send volume and unmute command to mqtt."""
         await self._conn.send_command("volume", volume * 100)
-        self._attr_volume_level = volume
-        if self._attr_is_volume_muted is True:
-            await self._conn.send_command("unmute")
-            self._attr_is_volume_muted = False
+        self._pending.expect(self, "volume", "_attr_volume_level", volume)
+        await self._async_unmute()
         self.async_write_ha_state()
 
     async def async_volume_up(self) -> None:
         """Send volume up and unmute command to mqtt."""
         await self._conn.send_command("volumeup", 1)
-        # Not sure about this, it will get updated by the event anyway
-        self._attr_volume_level = self._attr_volume_level + 0.01
-        if self._attr_is_volume_muted is True:
-            await self._conn.send_command("unmute")
-            self._attr_is_volume_muted = False
+        self._expect_volume_step(0.01)
+        await self._async_unmute()
         self.async_write_ha_state()
 
     async def async_volume_down(self) -> None:
         """Send volume down and unmute command to mqtt."""
         await self._conn.send_command("volumedown", 1)
-        # Not sure about this, it will get updated by the event anyway
-        self._attr_volume_level = self._attr_volume_level - 0.01
+        self._expect_volume_step(-0.01)
         self.async_write_ha_state()
 
+    def _expect_volume_step(self, step: float) -> None:
+        """Expect the volume to change one step."""
+        if self._attr_volume_level is not None:
+            volume = round(min(max(self._attr_volume_level + step, 0.0), 1.0), 2)
+            command = "volumeup" if step > 0 else "volumedown"
+            self._pending.expect(self, command, "_attr_volume_level", volume)
+
+    async def _async_unmute(self) -> None:
+        """Unmute after changing the volume."""
+        if self._attr_is_volume_muted is True:
+            await self._conn.send_command("unmute")
+            self._pending.expect(self, "unmute", "_attr_is_volume_muted", False)
+
     async def async_select_source(self, source: str) -> None:
         """Send new source to mqtt."""
         if source == SOURCE_LINEIN:
@@ -391,13 +562,43 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
         """Implement the websocket media browsing helper."""
 
         # Media_content_id is empty, create root
+        cache = self._manager.browse_cache
         if media_content_id is None:
-            return await media_root_payload(self.hass)
+            if (root := cache.get("")) is None:
+                root = await media_root_payload(self.hass)
+                cache.set("", root)
+            # The root is shared, the queue belongs to this speaker
+            return BrowseMedia(
+                title=root.title,
+                media_class=root.media_class,
+                media_content_id=root.media_content_id,
+                media_content_type=root.media_content_type,
+                can_play=root.can_play,
+                can_expand=root.can_expand,
+                children=[
+                    queue_root_node(),
+                    *favorites_root_nodes(),
+                    *(root.children or []),
+                ],
+            )
 
-        if media_source.is_media_source_id(media_content_id):
-            return await media_source.async_browse_media(
-                self.hass, media_content_id, content_filter=media_source_filter
+        if media_content_id in CONTAINERS:
+            return await self._manager.favorites.async_browse(
+                self._conn, media_content_id
+            )
+
+        if media_content_id.startswith(QUEUE_ID):
+            return await async_browse_queue(
+                self._coordinator_connection().queue, media_content_id
             )
+
+        if media_source.is_media_source_id(media_content_id):
+            if (result := cache.get(media_content_id)) is None:
+                result = await media_source.async_browse_media(
+                    self.hass, media_content_id, content_filter=media_source_filter
+                )
+                cache.set(media_content_id, result)
+            return result
         raise BrowseError(f"Media not found: {media_content_type} / {media_content_id}")
 
     async def async_play_media(
@@ -417,6 +618,27 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
             enqueue,
             announce,
         )
+        if (index := queue_track_index(media_id)) is not None:
+            # The speaker might play radio, tv or line-in, track numbers start at 1
+            conn = self._coordinator_connection()
+            await conn.send_command("switchtoqueue")
+            await conn.send_command("selecttrack", index + 1)
+            await conn.send_command("play")
+            return
+        if (item := self._manager.favorites.item(media_id)) is not None:
+            if not (uri := item.get("TrackUri")):
+                raise HomeAssistantError(f"{item.get('Title')} has no uri to play")
+            conn = self._coordinator_connection()
+            if item["ItemId"].startswith("SQ:"):
+                # Playlists replace the queue, which is played from the start
+                await conn.send_command("clearqueue")
+                await conn.send_command("queue", uri)
+                await conn.send_command("switchtoqueue")
+                await conn.send_command("play")
+                return
+            await conn.send_command("setavtransporturi", uri)
+            await conn.send_command("play")
+            return
         if media_id == BUILDIN_NOTIFICATION:
             await self._conn.send_command(
                 "notify",
@@ -429,12 +651,11 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
             )
             return
         if media_source.is_media_source_id(media_id):
-            info = await media_source.async_resolve_media(
-                self.hass, media_id, self.entity_id
-            )
-
             if media_id.startswith("media-source://tts/") or announce is True:
-                media_uri = async_process_play_media_url(self.hass, info.url)
+                # Resolved once for all speakers that announce this media
+                media_uri = await self._manager.announcements.async_resolve(
+                    media_id, self.entity_id
+                )
                 await self._conn.send_command(
                     "notify",
                     {
@@ -446,6 +667,10 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
                 )
                 return
 
+            info = await media_source.async_resolve_media(
+                self.hass, media_id, self.entity_id
+            )
+
             if media_id.startswith("media-source://radio_browser/"):
                 _LOGGER.debug(
                     "Try play from radio browser media id: %s url: %s",
@@ -482,6 +707,31 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
         )
         return None
 
+    async def async_join_players(self, group_members: list[str]) -> None:
+        """Join the other speakers to the group of this speaker."""
+        # Speakers of other bridges can join as well
+        managers: list[SonosManager] = list(self.hass.data[DOMAIN].values())
+        connections: list[MqttMediaConnection] = []
+        for entity_id in group_members:
+            conn = next(
+                (
+                    conn
+                    for manager in managers
+                    if (conn := manager.entity_connections.get(entity_id)) is not None
+                ),
+                None,
+            )
+            if conn is None:
+                raise HomeAssistantError(f"{entity_id} is not a Sonos speaker")
+            if conn is not self._conn:
+                connections.append(conn)
+        _LOGGER.debug("Joining %d speakers to %s", len(connections), self._conn.name)
+        await async_send_command_batch(connections, "joingroup", self._conn.name)
+
+    async def async_unjoin_player(self) -> None:
+        """Remove this speaker from its group."""
+        await self._conn.send_command("leavegroup")
+
     # Addition services to call
     async def async_clear_sleep_timer(self) -> None:
         """Clear current sleep timer"""
@@ -505,15 +755,24 @@ class SonosMediaPlayerEntity(MediaPlayerEntity):
 
     async def async_set_group_volume(self, volume: float) -> None:
         """Send volume and unmute command to mqtt."""
-        await self._conn.send_command("groupvolume", volume * 100)
+        await self._coordinator_connection().send_command("groupvolume", volume * 100)
 
     async def async_group_volume_up(self) -> None:
         """Send group volume up command to mqtt."""
-        await self._conn.send_command("groupvolumeup", 1)
+        await self._coordinator_connection().send_command("groupvolumeup", 1)
 
     async def async_group_volume_down(self) -> None:
         """Send volume down command to mqtt."""
-        await self._conn.send_command("groupvolumedown", 1)
+        await self._coordinator_connection().send_command("groupvolumedown", 1)
+
+    def _coordinator_connection(self) -> MqttMediaConnection:
+        """Return the connection of the group coordinator of this speaker."""
+        hub = self._conn.state
+        if hub.data is None or hub.group_index is None:
+            return self._conn
+        if (coordinator := hub.group_index.coordinator(hub.data[ATTR_UUID])) is None:
+            return self._conn
+        return coordinator.connection
 
 
 def time_string_to_seconds(time_string: str | None) -> int | None:
@@ -0,0 +1,176 @@
+"""Runtime metrics of the mqtt message handling."""
+from __future__ import annotations
+
+from bisect import bisect_left
+import time
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import async_get_platforms
+
+from .const import DOMAIN
+
+# Upper bounds of the histogram buckets in milliseconds
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+# Message rates are calculated over windows of this many seconds
+RATE_WINDOW = 10.0
+
+
+class Histogram:
+    """Histogram of durations in milliseconds."""
+
+    def __init__(self) -> None:
+        """Create empty histogram."""
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, duration: float) -> None:
+        """Add a duration in seconds."""
+        duration *= 1000
+        self.buckets[bisect_left(HISTOGRAM_BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    @property
+    def average(self) -> float | None:
+        """Return the average duration in milliseconds."""
+        return self.total / self.count if self.count else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return histogram for diagnostics."""
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS] + ["inf"]
+        return {
+            "count": self.count,
+            "average_ms": self.average,
+            "max_ms": self.max,
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class TopicStats:
+    """Message count and rate of a single topic."""
+
+    def __init__(self) -> None:
+        """Create empty topic stats."""
+        self.messages = 0
+        self._rate = 0.0
+        self._window_start = time.monotonic()
+        self._window_messages = 0
+
+    def record(self, now: float) -> None:
+        """Count a message received at monotonic time now."""
+        self.messages += 1
+        self._window_messages += 1
+        self._roll_window(now)
+
+    def _roll_window(self, now: float) -> None:
+        """Calculate the rate and start a new window, if the window is over."""
+        elapsed = now - self._window_start
+        if elapsed >= RATE_WINDOW:
+            self._rate = self._window_messages / elapsed
+            self._window_start = now
+            self._window_messages = 0
+
+    def rate(self, now: float) -> float:
+        """Return the rate of the last window at monotonic time now.
+
+        Also rolled when read, so the rate of a topic that went quiet drops to 0.
+        """
+        self._roll_window(now)
+        return self._rate
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return topic stats for diagnostics."""
+        return {
+            "messages": self.messages,
+            "messages_per_second": round(self.rate(time.monotonic()), 2),
+        }
+
+
+class IntegrationMetrics:
+    """Metrics of a single config entry, only created when enabled."""
+
+    def __init__(self) -> None:
+        """Create empty metrics."""
+        self.topics: dict[str, TopicStats] = {}
+        self.state_parse = Histogram()
+        self.state_handle = Histogram()
+        self.discovery_parse = Histogram()
+        # Sending the commands buffered while mqtt was offline
+        self.command_flush = Histogram()
+        self.invalid_states = 0
+        self.invalid_discoveries = 0
+        # From sending a command to the state message confirming it
+        self.command_round_trip: dict[str, Histogram] = {}
+        self.unconfirmed_commands = 0
+
+    def record_message(self, topic: str) -> None:
+        """Count a received message."""
+        if (stats := self.topics.get(topic)) is None:
+            stats = self.topics[topic] = TopicStats()
+        stats.record(time.monotonic())
+
+    def record_round_trip(self, command: str, duration: float) -> None:
+        """Add the round trip of a confirmed command, in seconds."""
+        if (histogram := self.command_round_trip.get(command)) is None:
+            histogram = self.command_round_trip[command] = Histogram()
+        histogram.observe(duration)
+
+    @property
+    def round_trip_average(self) -> float | None:
+        """Return the average round trip of all commands in milliseconds."""
+        histograms = self.command_round_trip.values()
+        count = sum(histogram.count for histogram in histograms)
+        if not count:
+            return None
+        return sum(histogram.total for histogram in histograms) / count
+
+    @property
+    def messages_per_second(self) -> float:
+        """Return the combined message rate of all topics."""
+        now = time.monotonic()
+        return sum(stats.rate(now) for stats in self.topics.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics for diagnostics."""
+        return {
+            "messages_per_second": round(self.messages_per_second, 2),
+            "invalid_states": self.invalid_states,
+            "invalid_discoveries": self.invalid_discoveries,
+            "state_parse": self.state_parse.as_dict(),
+            "state_handle": self.state_handle.as_dict(),
+            "discovery_parse": self.discovery_parse.as_dict(),
+            "command_flush": self.command_flush.as_dict(),
+            "unconfirmed_commands": self.unconfirmed_commands,
+            "command_round_trip": {
+                command: histogram.as_dict()
+                for command, histogram in sorted(self.command_round_trip.items())
+            },
+            "topics": {
+                topic: stats.as_dict() for topic, stats in sorted(self.topics.items())
+            },
+        }
+
+
+def collect_state_writes(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> dict[str, dict[str, int]]:
+    """Collect the state write counters of all media players of an entry."""
+    result: dict[str, dict[str, int]] = {}
+    for platform in async_get_platforms(hass, DOMAIN):
+        if platform.config_entry is not config_entry:
+            continue
+        for entity_id, entity in platform.entities.items():
+            if hasattr(entity, "suppressed_writes"):
+                result[entity_id] = {
+                    "state_writes": entity.state_writes,
+                    "suppressed_writes": entity.suppressed_writes,
+                    "coalesced_writes": entity.coalesced_writes,
+                }
+    return result
@@ -1,16 +1,23 @@
 """Capturing connectiong to mqtt."""
 from __future__ import annotations
 
+import asyncio
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from datetime import datetime
 import json
 import logging
+import time
 
 from typing import Any
 
 from homeassistant.components import mqtt
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity import DeviceInfo
 import homeassistant.helpers.device_registry as dr
+from homeassistant.helpers.event import async_call_later
 
 from .const import (
     ATTR_AVAILABILITY_TOPIC,
@@ -29,9 +36,48 @@ from .const import (
     SOURCE_QUEUE,
     SOURCE_TV,
 )
+from .correlation import REQUEST_TIMEOUT, RequestCorrelator
+from .queue_browser import QueueCache
+from .speaker_state import SpeakerStateHub
 
 _LOGGER = logging.getLogger(__name__)
 
+# Commands where only the last value within COMMAND_WINDOW is sent
+COALESCED_COMMANDS = {"volume", "groupvolume", "seek"}
+COMMAND_WINDOW = 0.2  # seconds
+
+# Maximum number of speakers a batched command is sent to at the same time
+BATCH_CONCURRENCY = 8
+
+# Commands buffered while mqtt is disconnected replace a buffered command with
+# the same key, other commands are all kept. Only commands that set an absolute
+# state have a key, two toggles must not collapse into one.
+OFFLINE_COMMAND_KEYS = {
+    "play": "transport",
+    "pause": "transport",
+    "stop": "transport",
+    "mute": "mute",
+    "unmute": "mute",
+    "switchtoline": "source",
+    "switchtoqueue": "source",
+    "switchtotv": "source",
+    **{
+        command: command
+        for command in (
+            "volume",
+            "groupvolume",
+            "seek",
+            "repeat",
+            "shuffle",
+            "crossfade",
+            "sleep",
+            "snooze",
+        )
+    },
+}
+OFFLINE_BUFFER_SIZE = 32  # commands per speaker
+OFFLINE_COMMAND_TTL = 60  # seconds, older commands are not sent after reconnect
+
 
 class MqttMediaConnection:
     """MQTT media connection containing the subscription data."""
@@ -45,12 +91,29 @@ class MqttMediaConnection:
     ) -> None:
         """Initialize the MQTT connection data from discovery message."""
         self.hass = hass
+        self._config_entry = config_entry
+        self._listeners: list[Callable[[], None]] = []
+        self.state = SpeakerStateHub(self)
+        self.queue = QueueCache(self)
+        self.media_player_entity_id: str | None = None
+        self.correlator: RequestCorrelator | None = None
+        # Set when the bridge no longer publishes this speaker
+        self.removed = False
+        self._pending_commands: dict[str, Any] = {}
+        self._cancel_command_window: CALLBACK_TYPE | None = None
+        self._offline_commands: OrderedDict[Hashable, tuple[float, str, Any]] = (
+            OrderedDict()
+        )
+        self._offline_sequence = 0
+        self._apply_discovery(data)
+
+    def _apply_discovery(self, data: DISCOVERY_PAYLOAD) -> None:
+        """Load topics and device info from discovery message."""
         self.state_topic = data[ATTR_STATE_TOPIC]
         self.command_topic = data[ATTR_COMMAND_TOPIC]
 
         self.availability_topic = data[ATTR_AVAILABILITY_TOPIC]
         self.name = data[ATTR_NAME]
-        self._config_entry = config_entry
         if ATTR_DEVICE in data:
             device = data[ATTR_DEVICE]
             self.identifier = device[ATTR_DEVICE_IDENTIFIERS][0]
@@ -67,6 +130,51 @@ class MqttMediaConnection:
             )
         else:
             self.identifier = data[ATTR_UNIQUE_ID]
+            self._device_info = None
+
+    @callback
+    def async_update(self, data: DISCOVERY_PAYLOAD) -> None:
+        """Update the connection in place from a changed discovery message."""
+        self._apply_discovery(data)
+
+        if self._device_info is not None:
+            registry = dr.async_get(self.hass)
+            if device := registry.async_get_device(
+                identifiers={(DOMAIN, self.identifier)}
+            ):
+                registry.async_update_device(
+                    device.id,
+                    name=self._device_info["name"],
+                    model=self._device_info["model"],
+                    manufacturer=self._device_info["manufacturer"],
+                    sw_version=self._device_info["sw_version"],
+                )
+
+        for listener in list(self._listeners):
+            listener()
+
+    @callback
+    def async_remove(self) -> None:
+        """Mark the connection removed, the listeners remove their entities."""
+        self.removed = True
+        if self._cancel_command_window is not None:
+            self._cancel_command_window()
+            self._cancel_command_window = None
+        self._pending_commands = {}
+        self._offline_commands.clear()
+        for listener in list(self._listeners):
+            listener()
+
+    @callback
+    def async_add_listener(self, listener: Callable[[], None]) -> CALLBACK_TYPE:
+        """Listen for discovery updates, returns a callable to stop listening."""
+        self._listeners.append(listener)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
 
     @property
     def config_entry(self) -> ConfigEntry:
@@ -90,6 +198,101 @@ class MqttMediaConnection:
 
     async def send_command(self, command: str, value: Any | None = None) -> None:
         """Send a command, and optional payload to the mqtt server."""
+        if command in COALESCED_COMMANDS:
+            if self._cancel_command_window is not None:
+                _LOGGER.debug("Delaying command %s to %s", command, self.command_topic)
+                self._pending_commands[command] = value
+                return
+            self._cancel_command_window = async_call_later(
+                self.hass, COMMAND_WINDOW, self._async_command_window_closed
+            )
+        else:
+            # Keep the order for commands that are not coalesced
+            await self._async_send_pending_commands()
+
+        await self._async_publish_command(command, value)
+
+    async def _async_command_window_closed(self, _now: datetime) -> None:
+        """Send the last value of delayed commands."""
+        self._cancel_command_window = None
+        if self._pending_commands:
+            self._cancel_command_window = async_call_later(
+                self.hass, COMMAND_WINDOW, self._async_command_window_closed
+            )
+            await self._async_send_pending_commands()
+
+    async def _async_send_pending_commands(self) -> None:
+        """Send all delayed commands."""
+        pending = self._pending_commands
+        self._pending_commands = {}
+        for command, value in pending.items():
+            await self._async_publish_command(command, value)
+
+    async def _async_publish_command(self, command: str, value: Any | None) -> None:
+        """Publish a single command to the command topic."""
+        if not mqtt.is_connected(self.hass):
+            self._async_buffer_command(command, value)
+            return
         _LOGGER.debug("Sending command %s to %s", command, self.command_topic)
         payload = json.dumps({"command": command, "input": value})
         await mqtt.async_publish(self.hass, self.command_topic, payload, 0)
+
+    async def async_request(
+        self, command: str, value: dict[str, Any], timeout: float = REQUEST_TIMEOUT
+    ) -> Any:
+        """Send a command that returns data, like adv-command, and await the reply."""
+        if self.correlator is None:
+            raise HomeAssistantError(f"{self.name} can not send requests")
+        return await self.correlator.async_request(self, command, value, timeout)
+
+    @callback
+    def _async_buffer_command(self, command: str, value: Any | None) -> None:
+        """Keep a command until mqtt is connected again."""
+        _LOGGER.debug(
+            "Buffering command %s for %s, mqtt is offline", command, self.name
+        )
+        key: Hashable | None = OFFLINE_COMMAND_KEYS.get(command)
+        if key is None:
+            self._offline_sequence += 1
+            key = (command, self._offline_sequence)
+        if key in self._offline_commands:
+            # The newer command takes the place at the end
+            del self._offline_commands[key]
+        elif len(self._offline_commands) >= OFFLINE_BUFFER_SIZE:
+            self._offline_commands.popitem(last=False)
+        self._offline_commands[key] = (time.monotonic(), command, value)
+
+    async def async_flush_offline_commands(self) -> None:
+        """Send the commands buffered while mqtt was offline, in order."""
+        if not self._offline_commands:
+            return
+        start = time.monotonic()
+        pending = self._offline_commands
+        self._offline_commands = OrderedDict()
+        _LOGGER.debug("Sending %d buffered commands to %s", len(pending), self.name)
+        for queued, command, value in pending.values():
+            if start - queued <= OFFLINE_COMMAND_TTL:
+                await self._async_publish_command(command, value)
+        if (metrics := self.state.metrics) is not None:
+            metrics.command_flush.observe(time.monotonic() - start)
+
+    @property
+    def offline_depth(self) -> int:
+        """Return the number of commands waiting for mqtt to reconnect."""
+        return len(self._offline_commands)
+
+
+async def async_send_command_batch(
+    connections: Iterable[MqttMediaConnection],
+    command: str,
+    value: Any | None = None,
+    limit: int = BATCH_CONCURRENCY,
+) -> None:
+    """Send the same command to several speakers concurrently."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def send(conn: MqttMediaConnection) -> None:
+        async with semaphore:
+            await conn.send_command(command, value)
+
+    await asyncio.gather(*(send(conn) for conn in connections))
@@ -0,0 +1,66 @@
+"""Optimistic state of commands that are not confirmed by the speaker yet."""
+from __future__ import annotations
+
+import math
+import time
+from typing import Any
+
+from .metrics import IntegrationMetrics
+
+# Expected values are kept this long, if the state does not confirm them
+PENDING_TIMEOUT = 5  # seconds
+
+
+class PendingCommands:
+    """Expected effect of the commands sent for an entity.
+
+    The entity shows the expected values right away. State messages from
+    before the command took effect don't undo them, the first state with
+    the expected value confirms the command and records its round trip.
+    """
+
+    def __init__(self) -> None:
+        """Create without pending commands."""
+        # Entity attribute to command, expected value, shown value and send time
+        self._pending: dict[str, tuple[str, Any, Any, float]] = {}
+
+    def expect(
+        self,
+        entity: Any,
+        command: str,
+        attribute: str,
+        expected: Any,
+        shown: Any = None,
+    ) -> None:
+        """Show the expected value of an attribute until a state confirms it.
+
+        The shown value is used instead of the expected value, if set.
+        """
+        shown = expected if shown is None else shown
+        self._pending[attribute] = (command, expected, shown, time.monotonic())
+        setattr(entity, attribute, shown)
+
+    def reconcile(self, entity: Any, metrics: IntegrationMetrics | None) -> None:
+        """Compare the attributes set from a state with the pending commands."""
+        if not self._pending:
+            return
+        now = time.monotonic()
+        for attribute, (command, expected, shown, sent) in list(self._pending.items()):
+            if _matches(getattr(entity, attribute), expected):
+                del self._pending[attribute]
+                if metrics is not None:
+                    metrics.record_round_trip(command, now - sent)
+            elif now - sent > PENDING_TIMEOUT:
+                # The speaker did not do what we expected, show the real state
+                del self._pending[attribute]
+                if metrics is not None:
+                    metrics.unconfirmed_commands += 1
+            else:
+                setattr(entity, attribute, shown)
+
+
+def _matches(actual: Any, expected: Any) -> bool:
+    """Compare values, volume levels have a small tolerance."""
+    if isinstance(expected, float) and isinstance(actual, float):
+        return math.isclose(actual, expected, abs_tol=0.005)
+    return actual == expected
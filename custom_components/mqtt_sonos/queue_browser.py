@@ -0,0 +1,236 @@
+"""Browse the play queue of a speaker in pages."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.media_player import (
+    BrowseError,
+    BrowseMedia,
+    MediaClass,
+    MediaType,
+)
+from homeassistant.core import callback
+
+from .const import ATTR_ENQUEUED_METADATA, ATTR_QUEUE_LENGTH
+
+if TYPE_CHECKING:
+    from .mqtt_media_connection import MqttMediaConnection
+
+_LOGGER = logging.getLogger(__name__)
+
+QUEUE_ID = "sonos2mqtt://queue"
+QUEUE_PAGE_ID = QUEUE_ID + "/page/"
+QUEUE_TRACK_ID = QUEUE_ID + "/track/"
+
+QUEUE_PAGE_SIZE = 100  # tracks
+QUEUE_CACHE_PAGES = 20  # per speaker
+
+
+class QueueCache:
+    """Pages of the play queue of a single speaker, fetched when browsed.
+
+    Pages are invalidated from the state messages: a new enqueued playlist
+    drops all pages, tracks added to the end only drop the pages from the
+    old last page on. A different UpdateID from the speaker drops all pages.
+    """
+
+    def __init__(self, conn: MqttMediaConnection) -> None:
+        """Create empty queue cache and follow the state of the speaker."""
+        self._conn = conn
+        self._pages: OrderedDict[int, list[dict[str, Any]]] = OrderedDict()
+        self._fetching: dict[int, asyncio.Task[list[dict[str, Any]]]] = {}
+        # Increased on every invalidation, so late fetches are not stored
+        self._generation = 0
+        self._update_id: Any = None
+        self._metadata: Any = None
+        self.length: int | None = None
+        self.hits = 0
+        self.fetches = 0
+        conn.state.async_add_listener(self.async_state_changed)
+
+    @callback
+    def async_state_changed(self, data: dict[str, Any]) -> None:
+        """Invalidate the pages that changed according to the state."""
+        length = data.get(ATTR_QUEUE_LENGTH, self.length)
+        metadata = data.get(ATTR_ENQUEUED_METADATA, self._metadata)
+        if metadata != self._metadata:
+            self._metadata = metadata
+            self.length = length
+            self.async_invalidate()
+            return
+        if length == self.length:
+            return
+        if self.length is not None and length is not None and length > self.length:
+            self.async_invalidate(from_page=self.length // QUEUE_PAGE_SIZE)
+        else:
+            self.async_invalidate()
+        self.length = length
+
+    @callback
+    def async_invalidate(self, from_page: int = 0) -> None:
+        """Drop the cached pages, starting at from_page."""
+        self._generation += 1
+        for page in [page for page in self._pages if page >= from_page]:
+            del self._pages[page]
+
+    async def async_get_page(self, page: int) -> list[dict[str, Any]]:
+        """Return the tracks of a page, fetched from the speaker if not cached."""
+        if (tracks := self._pages.get(page)) is not None:
+            self._pages.move_to_end(page)
+            self.hits += 1
+            return tracks
+        if (task := self._fetching.get(page)) is None:
+            task = self._fetching[page] = self._conn.hass.async_create_task(
+                self._async_fetch(page)
+            )
+            task.add_done_callback(lambda _: self._fetching.pop(page, None))
+        return await asyncio.shield(task)
+
+    async def _async_fetch(self, page: int) -> list[dict[str, Any]]:
+        """Fetch a single page of the queue."""
+        self.fetches += 1
+        generation = self._generation
+        reply = await self._conn.async_request(
+            "adv-command",
+            {
+                "cmd": "ContentDirectoryService.BrowseParsed",
+                "val": {
+                    "ObjectID": "Q:0",
+                    "BrowseFlag": "BrowseDirectChildren",
+                    "Filter": "*",
+                    "StartingIndex": page * QUEUE_PAGE_SIZE,
+                    "RequestedCount": QUEUE_PAGE_SIZE,
+                    "SortCriteria": "",
+                },
+            },
+        )
+        if not isinstance(reply, dict):
+            raise BrowseError(f"Unexpected queue reply from {self._conn.name}")
+
+        tracks = reply.get("Result") or []
+        if isinstance(tracks, dict):
+            # A single track is not sent as a list
+            tracks = [tracks]
+        if (total := reply.get("TotalMatches")) is not None:
+            self.length = int(total)
+
+        update_id = reply.get("UpdateID")
+        if update_id != self._update_id:
+            if self._update_id is not None:
+                _LOGGER.debug("Queue of %s changed, dropping pages", self._conn.name)
+                self.async_invalidate()
+                generation = self._generation
+            self._update_id = update_id
+
+        if generation == self._generation:
+            self._pages[page] = tracks
+            while len(self._pages) > QUEUE_CACHE_PAGES:
+                self._pages.popitem(last=False)
+        return tracks
+
+    @property
+    def cached_pages(self) -> int:
+        """Return the number of cached pages."""
+        return len(self._pages)
+
+
+def queue_root_node() -> BrowseMedia:
+    """Create the queue node for the root of the media browser."""
+    return BrowseMedia(
+        title="Queue",
+        media_class=MediaClass.PLAYLIST,
+        media_content_id=QUEUE_ID,
+        media_content_type=MediaType.PLAYLIST,
+        can_play=False,
+        can_expand=True,
+    )
+
+
+async def async_browse_queue(cache: QueueCache, media_content_id: str) -> BrowseMedia:
+    """Browse the queue, queues longer than a page show the pages first."""
+    if media_content_id.startswith(QUEUE_PAGE_ID):
+        try:
+            page = int(media_content_id[len(QUEUE_PAGE_ID) :])
+        except ValueError as error:
+            raise BrowseError(f"Media not found: {media_content_id}") from error
+        return _page_node(page, await cache.async_get_page(page), cache.length)
+
+    # Fetching the first page also updates the length of the queue
+    tracks = await cache.async_get_page(0)
+    length = cache.length or len(tracks)
+    if length <= QUEUE_PAGE_SIZE:
+        node = _page_node(0, tracks, length)
+        node.title = "Queue"
+        node.media_content_id = QUEUE_ID
+        return node
+
+    pages = (length + QUEUE_PAGE_SIZE - 1) // QUEUE_PAGE_SIZE
+    return BrowseMedia(
+        title="Queue",
+        media_class=MediaClass.PLAYLIST,
+        media_content_id=QUEUE_ID,
+        media_content_type=MediaType.PLAYLIST,
+        can_play=False,
+        can_expand=True,
+        children_media_class=MediaClass.DIRECTORY,
+        children=[
+            BrowseMedia(
+                title=_page_title(page, length),
+                media_class=MediaClass.DIRECTORY,
+                media_content_id=f"{QUEUE_PAGE_ID}{page}",
+                media_content_type=MediaType.PLAYLIST,
+                can_play=False,
+                can_expand=True,
+            )
+            for page in range(pages)
+        ],
+    )
+
+
+def queue_track_index(media_content_id: str) -> int | None:
+    """Return the index in the queue of a track media id."""
+    if not media_content_id.startswith(QUEUE_TRACK_ID):
+        return None
+    try:
+        return int(media_content_id[len(QUEUE_TRACK_ID) :])
+    except ValueError:
+        return None
+
+
+def _page_title(page: int, length: int | None) -> str:
+    """Return the title of a page, like `Tracks 101 - 200`."""
+    last = (page + 1) * QUEUE_PAGE_SIZE
+    if length is not None:
+        last = min(last, length)
+    return f"Tracks {page * QUEUE_PAGE_SIZE + 1} - {last}"
+
+
+def _page_node(
+    page: int, tracks: list[dict[str, Any]], length: int | None
+) -> BrowseMedia:
+    """Create the node with the tracks of a page."""
+    start = page * QUEUE_PAGE_SIZE
+    return BrowseMedia(
+        title=_page_title(page, length),
+        media_class=MediaClass.DIRECTORY,
+        media_content_id=f"{QUEUE_PAGE_ID}{page}",
+        media_content_type=MediaType.PLAYLIST,
+        can_play=False,
+        can_expand=True,
+        children_media_class=MediaClass.TRACK,
+        children=[
+            BrowseMedia(
+                title=track.get("Title") or "Unknown",
+                media_class=MediaClass.TRACK,
+                media_content_id=f"{QUEUE_TRACK_ID}{start + index}",
+                media_content_type=MediaType.TRACK,
+                can_play=True,
+                can_expand=False,
+                thumbnail=track.get("AlbumArtUri"),
+            )
+            for index, track in enumerate(tracks)
+        ],
+    )
@@ -0,0 +1,183 @@
+"""Diagnostic sensors with the metrics of the integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+import logging
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN
+from .metrics import IntegrationMetrics, collect_state_writes
+from .sonos_manager import SonosManager
+
+_LOGGER = logging.getLogger(__name__)
+
+
+MetricsValueFn = Callable[
+    [HomeAssistant, ConfigEntry, IntegrationMetrics], float | None
+]
+
+
+@dataclass(frozen=True, kw_only=True)
+class MetricsSensorEntityDescription(SensorEntityDescription):
+    """Sensor description with a function to read the value."""
+
+    value_fn: MetricsValueFn
+
+
+def _sum_writes(key: str) -> MetricsValueFn:
+    """Create function to sum a state write counter of all media players."""
+    return lambda hass, entry, metrics: sum(
+        counters[key] for counters in collect_state_writes(hass, entry).values()
+    )
+
+
+def _ingest_counter(key: str) -> MetricsValueFn:
+    """Create function to read a counter of the ingest queue."""
+    return lambda hass, entry, metrics: getattr(
+        hass.data[DOMAIN][entry.entry_id].ingest, key
+    )
+
+
+def _buffered_commands(
+    hass: HomeAssistant, entry: ConfigEntry, metrics: IntegrationMetrics
+) -> int:
+    """Count the commands of all speakers waiting for mqtt to reconnect."""
+    manager: SonosManager = hass.data[DOMAIN][entry.entry_id]
+    return sum(conn.offline_depth for conn in manager.connections.values())
+
+
+SENSORS: tuple[MetricsSensorEntityDescription, ...] = (
+    MetricsSensorEntityDescription(
+        key="messages_per_second",
+        name="Messages per second",
+        native_unit_of_measurement="msg/s",
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=1,
+        value_fn=lambda hass, entry, metrics: round(metrics.messages_per_second, 2),
+    ),
+    MetricsSensorEntityDescription(
+        key="state_parse_time",
+        name="State parse time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=3,
+        value_fn=lambda hass, entry, metrics: metrics.state_parse.average,
+    ),
+    MetricsSensorEntityDescription(
+        key="state_handle_time",
+        name="State handle time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=3,
+        value_fn=lambda hass, entry, metrics: metrics.state_handle.average,
+    ),
+    MetricsSensorEntityDescription(
+        key="invalid_payloads",
+        name="Invalid payloads",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda hass, entry, metrics: metrics.invalid_states
+        + metrics.invalid_discoveries,
+    ),
+    MetricsSensorEntityDescription(
+        key="state_writes",
+        name="State writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=_sum_writes("state_writes"),
+    ),
+    MetricsSensorEntityDescription(
+        key="suppressed_writes",
+        name="Suppressed state writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=_sum_writes("suppressed_writes"),
+    ),
+    MetricsSensorEntityDescription(
+        key="coalesced_messages",
+        name="Coalesced messages",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=_ingest_counter("coalesced"),
+    ),
+    MetricsSensorEntityDescription(
+        key="dropped_messages",
+        name="Dropped messages",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=_ingest_counter("dropped"),
+    ),
+    MetricsSensorEntityDescription(
+        key="buffered_commands",
+        name="Buffered commands",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_buffered_commands,
+    ),
+    MetricsSensorEntityDescription(
+        key="command_flush_time",
+        name="Command flush time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=1,
+        value_fn=lambda hass, entry, metrics: metrics.command_flush.average,
+    ),
+    MetricsSensorEntityDescription(
+        key="command_round_trip",
+        name="Command round trip",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda hass, entry, metrics: metrics.round_trip_average,
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entries: AddEntitiesCallback,
+) -> None:
+    """Configure the metrics sensors, if metrics are enabled."""
+    _LOGGER.debug("async_setup_entry called")
+    manager: SonosManager = hass.data[DOMAIN][config_entry.entry_id]
+    if manager.metrics is None:
+        return
+    async_add_entries(
+        [
+            MetricsSensorEntity(config_entry, manager.metrics, description)
+            for description in SENSORS
+        ],
+        True,
+    )
+
+
+class MetricsSensorEntity(SensorEntity):
+    """Diagnostic sensor showing one of the metrics, polled by Home Assistant."""
+
+    entity_description: MetricsSensorEntityDescription
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(
+        self,
+        config_entry: ConfigEntry,
+        metrics: IntegrationMetrics,
+        description: MetricsSensorEntityDescription,
+    ) -> None:
+        """Initialize the metrics sensor."""
+        self.entity_description = description
+        self._config_entry = config_entry
+        self._metrics = metrics
+        self._attr_name = f"Sonos2mqtt {description.name}"
+        self._attr_unique_id = f"{config_entry.entry_id}_{description.key}"
+
+    async def async_update(self) -> None:
+        """Read the current value from the metrics."""
+        self._attr_native_value = self.entity_description.value_fn(
+            self.hass, self._config_entry, self._metrics
+        )
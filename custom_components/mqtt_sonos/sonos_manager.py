@@ -1,25 +1,67 @@
 """Sonos manager."""
 from __future__ import annotations
 
+from collections import OrderedDict
+import hashlib
 import logging
+import time
+from typing import Any
 
 import voluptuous as vol
 
 from homeassistant.components import mqtt
 from homeassistant.components.mqtt.models import ReceiveMessage
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.const import Platform
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.const import EVENT_COMPONENT_LOADED, Platform
 from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 
-from .const import ATTR_UNIQUE_ID, DISCOVERY_PAYLOAD, EVENT_DISCOVERED
+from .announcements import AnnouncementResolver
+from .browse_cache import BrowseCache
+from .const import (
+    ATTR_STATE_TOPIC,
+    ATTR_UNIQUE_ID,
+    CONF_DISTINCT_TOPICS,
+    CONF_METRICS,
+    CONF_MQTT_PREFIX,
+    DEFAULT_MQTT_PREFIX,
+    DISCOVERY_PAYLOAD,
+    DOMAIN,
+    EVENT_DISCOVERED,
+)
+from .correlation import RequestCorrelator
+from .favorites import FavoritesCache
+from .ingest import IngestQueue
+from .metrics import IntegrationMetrics
 from .mqtt_media_connection import MqttMediaConnection
+from .speaker_state import GroupIndex, SpeakerStateHub
+from .state_parser import DISTINCT_ATTRIBUTES
+from .subscriptions import SubscriptionRegistry
 
-PLATFORMS: list[Platform] = [Platform.MEDIA_PLAYER]  # Platform.SWITCH
+PLATFORMS: list[Platform] = [Platform.MEDIA_PLAYER, Platform.SENSOR, Platform.SWITCH]
 
 _LOGGER = logging.getLogger(__name__)
 
-DISCOVERY_TOPIC = "sonos2mqtt/discovery/#"
+# Topics of a bridge, formatted with its mqtt prefix
+DISCOVERY_TOPIC = "{}/discovery/#"
+STATE_TOPIC = "{}/+"
+# Formatted with the prefix and a property, a wildcard for the property would
+# also match the command and reply topics
+DISTINCT_STATE_TOPIC = STATE_TOPIC + "/{}"
+
+# Owner of each speaker, shared by the managers of all bridges
+DATA_OWNERS = f"{DOMAIN}_owners"
+
+STORAGE_VERSION = 1
+CACHE_SAVE_DELAY = 10  # seconds
+# New speakers are collected this long, to add their entities at once
+DISCOVERY_SETTLE_TIME = 0.5  # seconds
+# Cached speakers are removed, if no retained discovery confirms them this long
+DISCOVERY_CONFIRM_TIMEOUT = 10  # seconds
+# Latest state of topics without a speaker yet, replayed when it is added
+UNROUTED_STATE_SIZE = 256  # topics
 
 
 class SonosManager:
@@ -33,41 +75,468 @@ class SonosManager:
         _LOGGER.debug("__init__ called")
         self._config_entry = config_entry
         self.hass = hass
+        self.prefix = mqtt_prefix(config_entry)
         self.connections: dict[str, MqttMediaConnection] = {}
+        # Speakers discovered by this bridge, that are owned by another bridge
+        self._standby: dict[str, DISCOVERY_PAYLOAD] = {}
+        # Latest state of the standby speakers by topic, not bounded like the
+        # other unrouted states, to replay it when this bridge takes over
+        self._standby_states: dict[str, ReceiveMessage | None] = {}
+        # Discovery topic to the uuid of that speaker
+        self._topic_speakers: dict[str, str] = {}
+        self._owners = speaker_owners(hass)
+        self._owners.async_register(self)
+        config_entry.async_on_unload(self._async_release_all)
+        # Media player entity id to the connection of that speaker
+        self.entity_connections: dict[str, MqttMediaConnection] = {}
+        self._discovery_fingerprints: dict[str, str] = {}
+        # Raw discovery payloads by topic, persisted for a fast startup
+        self._discovery_cache: dict[str, str] = {}
+        self._store = _discovery_store(hass, config_entry)
+        # Cached discovery topics not received from the broker yet
+        self._unconfirmed: set[str] = set()
+        self._cancel_confirm: CALLBACK_TYPE | None = None
+        config_entry.async_on_unload(self._async_cancel_confirm)
+        self._state_hubs: dict[str, SpeakerStateHub] = {}
+        self._unrouted_states: OrderedDict[str, ReceiveMessage] = OrderedDict()
+        self._direct_subscriptions: dict[str, CALLBACK_TYPE] = {}
+        # Token of the subscription being set up for each direct state topic
+        self._pending_subscriptions: dict[str, object] = {}
+        self.subscriptions = SubscriptionRegistry(hass)
+        config_entry.async_on_unload(self.subscriptions.async_unsubscribe_all)
+        self.correlator = RequestCorrelator(hass, self.prefix, self.subscriptions)
+        config_entry.async_on_unload(self.correlator.async_cancel_all)
+        self.group_index = GroupIndex()
+        self.browse_cache = BrowseCache()
+        self.favorites = FavoritesCache(hass, config_entry)
+        config_entry.async_on_unload(self.favorites.async_cancel)
+        self.announcements = AnnouncementResolver(hass)
+        self.ingest = IngestQueue(hass)
+        config_entry.async_on_unload(self.ingest.async_clear)
+        self._discovered: list[MqttMediaConnection] = []
+        self._cancel_discovered: CALLBACK_TYPE | None = None
+        config_entry.async_on_unload(self._async_cancel_discovered)
+        self.metrics: IntegrationMetrics | None = (
+            IntegrationMetrics() if config_entry.options.get(CONF_METRICS) else None
+        )
+
+        @callback
+        def component_loaded(event: Event) -> None:
+            """Clear the browse cache, the new component might add media sources."""
+            self.browse_cache.clear()
+
+        config_entry.async_on_unload(
+            hass.bus.async_listen(EVENT_COMPONENT_LOADED, component_loaded)
+        )
 
     def get_connections(self) -> dict[str, MqttMediaConnection]:
         """Load all discovered speakers."""
         return self.connections
 
+    @callback
+    def _async_route_state(
+        self, conn: MqttMediaConnection, old_topic: str | None = None
+    ) -> None:
+        """Route the state topic of a connection to its state hub.
+
+        Topics matching STATE_TOPIC are routed from the shared wildcard
+        subscription, other topics get their own mqtt subscription.
+        """
+        if old_topic is not None:
+            self._async_unroute_state(old_topic)
+
+        conn.state.metrics = self.metrics
+        conn.state.group_index = self.group_index
+        if _is_routed_state_topic(conn.state_topic, self.prefix):
+            self._state_hubs[conn.state_topic] = conn.state
+            # The retained state can arrive before the discovery message
+            if (msg := self._unrouted_states.pop(conn.state_topic, None)) is not None:
+                conn.state.async_message_received(msg)
+            return
+
+        @callback
+        def state_received(msg: ReceiveMessage):
+            """Queue state message of this speaker."""
+            self.ingest.async_put(conn.state.async_message_received, msg)
+
+        topic = conn.state_topic
+        # Set before the task starts, it might not suspend before it is done
+        token = self._pending_subscriptions[topic] = object()
+
+        async def async_subscribe() -> None:
+            try:
+                unsubscribe = await self.subscriptions.async_subscribe(
+                    topic, state_received
+                )
+            finally:
+                routed = self._pending_subscriptions.get(topic) is token
+                if routed:
+                    del self._pending_subscriptions[topic]
+            if routed:
+                self._direct_subscriptions[topic] = unsubscribe
+            else:
+                # Unrouted while subscribing
+                unsubscribe()
+
+        self.hass.async_create_task(async_subscribe())
+
+    @callback
+    def _async_unroute_state(self, topic: str) -> None:
+        """Stop routing a state topic."""
+        self._state_hubs.pop(topic, None)
+        # A pending subscription removes itself when it is done
+        self._pending_subscriptions.pop(topic, None)
+        if unsubscribe := self._direct_subscriptions.pop(topic, None):
+            unsubscribe()
+
     async def async_start_discovery(self) -> None:
         """Start sonos device discovery, call from __init__."""
         _LOGGER.debug("async_start_discovery called")
 
+        @callback
+        def connection_status_changed(connected: bool) -> None:
+            """Send the commands buffered while mqtt was offline."""
+            if connected:
+                for conn in self.connections.values():
+                    self.hass.async_create_task(conn.async_flush_offline_commands())
+
+        self._config_entry.async_on_unload(
+            mqtt.async_subscribe_connection_status(self.hass, connection_status_changed)
+        )
+
+        @callback
+        def route_state(msg: ReceiveMessage):
+            """Route state message to the state hub of this topic."""
+            if hub := self._state_hubs.get(msg.topic):
+                hub.async_message_received(msg)
+                return
+            if msg.topic in self._standby_states:
+                self._standby_states[msg.topic] = msg
+                return
+            # Keep it for a speaker that is not discovered or owned yet
+            self._unrouted_states[msg.topic] = msg
+            self._unrouted_states.move_to_end(msg.topic)
+            if len(self._unrouted_states) > UNROUTED_STATE_SIZE:
+                self._unrouted_states.popitem(last=False)
+
+        @callback
+        def state_received(msg: ReceiveMessage):
+            """Queue state message, the hub is looked up when it is handled."""
+            self.ingest.async_put(route_state, msg)
+
+        await self.subscriptions.async_subscribe(
+            STATE_TOPIC.format(self.prefix), state_received
+        )
+
+        @callback
+        def route_attribute(msg: ReceiveMessage):
+            """Route distinct property message to the state hub of the speaker."""
+            topic, _, key = msg.topic.rpartition("/")
+            if hub := self._state_hubs.get(topic):
+                hub.async_attribute_received(key, msg)
+
+        @callback
+        def attribute_received(msg: ReceiveMessage):
+            """Queue distinct property message."""
+            self.ingest.async_put(route_attribute, msg)
+
+        if self._config_entry.options.get(CONF_DISTINCT_TOPICS):
+            for key in sorted(DISTINCT_ATTRIBUTES):
+                await self.subscriptions.async_subscribe(
+                    DISTINCT_STATE_TOPIC.format(self.prefix, key), attribute_received
+                )
+
+        @callback
+        def handle_discovery(msg: ReceiveMessage):
+            """Handle queued discovery message."""
+            self._async_handle_discovery(msg.topic, msg.payload)
+
         @callback
         def discovery_received(msg: ReceiveMessage):
             """MQTT message callback."""
-            try:
-                data = DISCOVERY_PAYLOAD(msg.payload)
-            except vol.MultipleInvalid as error:
-                _LOGGER.warning(
-                    "Skipping discovery because of malformatted data: %s", error
-                )
+            if self.metrics is not None:
+                self.metrics.record_message(msg.topic)
+            if self._unconfirmed:
+                self._async_confirm_discovery(msg.topic)
+            # Retained discovery messages are not sent again, never drop them
+            self.ingest.async_put(handle_discovery, msg, keep=True)
+
+        await self.subscriptions.async_subscribe(
+            DISCOVERY_TOPIC.format(self.prefix), discovery_received
+        )
+        await self.correlator.async_subscribe()
+        if self._unconfirmed:
+            self._async_schedule_prune(DISCOVERY_CONFIRM_TIMEOUT)
+
+    async def async_load_discovery_cache(self) -> None:
+        """Create the speakers from the last known discovery messages.
+
+        Call after the platforms are set up and before discovery is started,
+        live discovery messages will update the cached speakers.
+        """
+        if (cache := await self._store.async_load()) is None:
+            return
+        _LOGGER.debug("Loading %d cached discovery messages", len(cache))
+        for topic, payload in cache.items():
+            self._async_handle_discovery(topic, payload, from_cache=True)
+        self._unconfirmed = set(self._discovery_cache)
+        self._async_send_discovered()
+
+    @callback
+    def _async_confirm_discovery(self, topic: str) -> None:
+        """Confirm a cached topic, prune the others once the retained burst settled."""
+        self._unconfirmed.discard(topic)
+        self._async_schedule_prune(DISCOVERY_SETTLE_TIME)
+
+    @callback
+    def _async_schedule_prune(self, delay: float) -> None:
+        """Restart the timer to remove the unconfirmed cached speakers."""
+        self._async_cancel_confirm()
+        self._cancel_confirm = async_call_later(
+            self.hass, delay, self._async_prune_unconfirmed
+        )
+
+    @callback
+    def _async_prune_unconfirmed(self, _now: Any = None) -> None:
+        """Remove the cached speakers the bridge no longer publishes.
+
+        Their retained discovery message was cleared while Home Assistant
+        was not running, so no empty message will remove them.
+        """
+        self._cancel_confirm = None
+        if not mqtt.is_connected(self.hass):
+            # The retained messages are received after reconnecting
+            self._async_schedule_prune(DISCOVERY_CONFIRM_TIMEOUT)
+            return
+        unconfirmed, self._unconfirmed = self._unconfirmed, set()
+        for topic in unconfirmed:
+            _LOGGER.debug("Removing cached discovery %s, not retained anymore", topic)
+            self._async_handle_discovery(topic, "")
+
+    @callback
+    def _async_cancel_confirm(self) -> None:
+        """Cancel the pending prune timer."""
+        if self._cancel_confirm is not None:
+            self._cancel_confirm()
+            self._cancel_confirm = None
+
+    @callback
+    def _async_handle_discovery(
+        self, topic: str, payload: str, from_cache: bool = False
+    ) -> None:
+        """Handle discovery message for a single speaker."""
+        # Retained discovery messages are received again on every reconnect
+        fingerprint = discovery_fingerprint(payload)
+        if self._discovery_fingerprints.get(topic) == fingerprint:
+            return
+
+        if not payload:
+            # Empty retained message, the bridge removed this speaker
+            self._discovery_fingerprints.pop(topic, None)
+            if self._discovery_cache.pop(topic, None) is not None:
+                self._store.async_delay_save(self._data_to_save, CACHE_SAVE_DELAY)
+            if (uuid := self._topic_speakers.pop(topic, None)) is not None:
+                self._async_remove_speaker(uuid)
+            return
+
+        if self.metrics is not None:
+            start = time.perf_counter()
+        try:
+            data = DISCOVERY_PAYLOAD(payload)
+        except vol.MultipleInvalid as error:
+            if self.metrics is not None:
+                self.metrics.invalid_discoveries += 1
+            _LOGGER.warning(
+                "Skipping discovery because of malformatted data: %s", error
+            )
+            return
+        if self.metrics is not None:
+            self.metrics.discovery_parse.observe(time.perf_counter() - start)
+        _LOGGER.debug("Got sonos discovery data %s", data)
+        self._discovery_fingerprints[topic] = fingerprint
+        self._discovery_cache[topic] = payload
+        if not from_cache:
+            self._store.async_delay_save(self._data_to_save, CACHE_SAVE_DELAY)
+
+        uuid = data[ATTR_UNIQUE_ID]
+        self._topic_speakers[topic] = uuid
+        if uuid in self.connections:
+            _LOGGER.debug("Updating discovery info")
+            conn = self.connections[uuid]
+            old_topic = conn.state_topic
+            conn.async_update(data)
+            if conn.state_topic != old_topic:
+                self._async_route_state(conn, old_topic)
+        elif self._owners.async_claim(uuid, self):
+            self._async_pop_standby(uuid)
+            self._async_add_speaker(data, from_cache)
+        else:
+            _LOGGER.debug("Speaker %s is owned by another bridge", uuid)
+            self._async_set_standby(uuid, data)
+
+    @callback
+    def _async_add_speaker(
+        self, data: DISCOVERY_PAYLOAD, from_cache: bool = False
+    ) -> None:
+        """Create the connection of a speaker owned by this bridge."""
+        conn = MqttMediaConnection(self.hass, self._config_entry, data)
+        conn.correlator = self.correlator
+        self.connections[data[ATTR_UNIQUE_ID]] = conn
+        self._async_route_state(conn)
+        self._discovered.append(conn)
+        if not from_cache and self._cancel_discovered is None:
+            self._cancel_discovered = async_call_later(
+                self.hass, DISCOVERY_SETTLE_TIME, self._async_send_discovered
+            )
+
+    @callback
+    def _async_remove_speaker(self, uuid: str) -> None:
+        """Remove a speaker this bridge no longer publishes."""
+        self._async_pop_standby(uuid)
+        if (conn := self.connections.pop(uuid, None)) is None:
+            return
+        _LOGGER.debug("Removing speaker %s", conn.name)
+        if conn in self._discovered:
+            self._discovered.remove(conn)
+        self._async_unroute_state(conn.state_topic)
+        self.group_index.async_remove(uuid)
+        conn.async_remove()
+        self._owners.async_release(uuid, self)
+
+    @callback
+    def async_claim_standby(self, uuid: str) -> bool:
+        """Take over a speaker released by another bridge, if this bridge has it."""
+        if uuid not in self._standby or not self._owners.async_claim(uuid, self):
+            return False
+        _LOGGER.debug("Taking over speaker %s from another bridge", uuid)
+        data = self._standby[uuid]
+        msg = self._async_pop_standby(uuid)
+        self._async_add_speaker(data)
+        if msg is not None:
+            # The retained state was received while the speaker was on standby
+            self.connections[uuid].state.async_message_received(msg)
+        return True
+
+    @callback
+    def _async_set_standby(self, uuid: str, data: DISCOVERY_PAYLOAD) -> None:
+        """Keep a speaker owned by another bridge, and its latest state."""
+        msg = self._async_pop_standby(uuid)
+        topic = data[ATTR_STATE_TOPIC]
+        self._standby[uuid] = data
+        self._standby_states[topic] = self._unrouted_states.pop(topic, msg)
+
+    @callback
+    def _async_pop_standby(self, uuid: str) -> ReceiveMessage | None:
+        """Remove a speaker from standby, returns its latest state message."""
+        if (data := self._standby.pop(uuid, None)) is None:
+            return None
+        return self._standby_states.pop(data[ATTR_STATE_TOPIC], None)
+
+    @callback
+    def _async_release_all(self) -> None:
+        """Release all speakers on unload, other bridges can take them over."""
+        self._owners.async_unregister(self)
+        for uuid in self.connections:
+            self._owners.async_release(uuid, self)
+
+    @callback
+    def _async_send_discovered(self, _now: Any = None) -> None:
+        """Let the platforms add the entities of all new speakers at once."""
+        self._async_cancel_discovered()
+        if not self._discovered:
+            return
+        _LOGGER.debug("Adding %d discovered speakers", len(self._discovered))
+        discovered, self._discovered = self._discovered, []
+        async_dispatcher_send(
+            self.hass, f"{EVENT_DISCOVERED}_{self._config_entry.entry_id}", discovered
+        )
+
+    @callback
+    def _async_cancel_discovered(self) -> None:
+        """Cancel the pending settle timer."""
+        if self._cancel_discovered is not None:
+            self._cancel_discovered()
+            self._cancel_discovered = None
+
+    @callback
+    def _data_to_save(self) -> dict[str, str]:
+        """Return the discovery cache to store."""
+        return self._discovery_cache
+
+
+class SpeakerOwners:
+    """Owner of each speaker, when several bridges discover the same speaker.
+
+    The first bridge that discovers a speaker owns it, other bridges keep
+    it on standby and take it over when the owner releases it.
+    """
+
+    def __init__(self) -> None:
+        """Create empty owners."""
+        self._managers: list[SonosManager] = []
+        self._owners: dict[str, SonosManager] = {}
+
+    @callback
+    def async_register(self, manager: SonosManager) -> None:
+        """Add the manager of a bridge."""
+        self._managers.append(manager)
+
+    @callback
+    def async_unregister(self, manager: SonosManager) -> None:
+        """Remove the manager of a bridge, call before releasing its speakers."""
+        if manager in self._managers:
+            self._managers.remove(manager)
+
+    @callback
+    def async_claim(self, uuid: str, manager: SonosManager) -> bool:
+        """Claim a speaker, returns if the manager owns it."""
+        return self._owners.setdefault(uuid, manager) is manager
+
+    @callback
+    def async_release(self, uuid: str, manager: SonosManager) -> None:
+        """Release a speaker and let another bridge take it over."""
+        if self._owners.get(uuid) is not manager:
+            return
+        del self._owners[uuid]
+        for other in self._managers:
+            if other is not manager and other.async_claim_standby(uuid):
                 return
-            _LOGGER.debug("Got sonos discovery data %s", data)
-            uuid = data[ATTR_UNIQUE_ID]
-            if uuid in self.connections:
-                _LOGGER.debug("Updating discovery info")
-                self.connections[uuid] = MqttMediaConnection(
-                    self.hass, self._config_entry, data
-                )
-                # Not sure if this is needed or what this does
-                # async_dispatcher_send(self.hass, EVENT_DISCOVERED, self.connections[uuid])
-            else:
-                self.connections[uuid] = MqttMediaConnection(
-                    self.hass, self._config_entry, data
-                )
-                async_dispatcher_send(
-                    self.hass, EVENT_DISCOVERED, self.connections[uuid]
-                )
 
-        await mqtt.async_subscribe(self.hass, DISCOVERY_TOPIC, discovery_received)
+
+def speaker_owners(hass: HomeAssistant) -> SpeakerOwners:
+    """Return the speaker owners shared by all config entries."""
+    if (owners := hass.data.get(DATA_OWNERS)) is None:
+        owners = hass.data[DATA_OWNERS] = SpeakerOwners()
+    return owners
+
+
+def mqtt_prefix(config_entry: ConfigEntry) -> str:
+    """Return the mqtt prefix of the bridge of a config entry."""
+    return config_entry.data.get(CONF_MQTT_PREFIX, DEFAULT_MQTT_PREFIX)
+
+
+async def async_remove_discovery_cache(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> None:
+    """Remove the persisted discovery cache of a config entry."""
+    await _discovery_store(hass, config_entry).async_remove()
+
+
+def _discovery_store(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> Store[dict[str, str]]:
+    """Create the store for the discovery cache of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{config_entry.entry_id}.discovery")
+
+
+def discovery_fingerprint(payload: str | bytes) -> str:
+    """Create fingerprint of the raw discovery payload."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return hashlib.sha1(payload, usedforsecurity=False).hexdigest()
+
+
+def _is_routed_state_topic(topic: str, prefix: str) -> bool:
+    """Check if the topic is matched by the STATE_TOPIC of a prefix."""
+    prefix = STATE_TOPIC.format(prefix)[:-1]
+    return topic.startswith(prefix) and "/" not in topic[len(prefix) :]
@@ -0,0 +1,215 @@
+"""Shared state of a single speaker."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.components.mqtt.models import ReceiveMessage
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .const import ATTR_COORDINATOR, ATTR_NAME, ATTR_TRANSPORTSTATE, ATTR_UUID
+from .metrics import IntegrationMetrics
+from .state_parser import parse_state_attribute, parse_state_payload
+
+if TYPE_CHECKING:
+    from .mqtt_media_connection import MqttMediaConnection
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class GroupIndex:
+    """Group topology of all speakers, based on the coordinatorUuid in the state."""
+
+    def __init__(self) -> None:
+        """Create empty group index."""
+        self.hubs: dict[str, SpeakerStateHub] = {}
+        # Speaker uuid to coordinator uuid
+        self.coordinators: dict[str, str] = {}
+        # Coordinator uuid to all speakers in the group, including the coordinator
+        self.groups: dict[str, set[str]] = {}
+
+    @callback
+    def async_update(self, hub: SpeakerStateHub, data: dict[str, Any]) -> None:
+        """Update the index from a state message."""
+        uuid = data[ATTR_UUID]
+        coordinator = data.get(ATTR_COORDINATOR, uuid)
+        self.hubs[uuid] = hub
+        if (old_coordinator := self.coordinators.get(uuid)) == coordinator:
+            return
+
+        changed: set[str] = set()
+        if old_coordinator is not None:
+            group = self.groups[old_coordinator]
+            group.discard(uuid)
+            changed |= group
+            if not group:
+                del self.groups[old_coordinator]
+        self.coordinators[uuid] = coordinator
+        group = self.groups.setdefault(coordinator, set())
+        changed |= group
+        group.add(uuid)
+
+        # Other speakers in both groups have new group members
+        for member in changed:
+            if (member_hub := self.hubs.get(member)) is not None:
+                member_hub.async_notify_listeners()
+
+    @callback
+    def async_remove(self, uuid: str) -> None:
+        """Remove a speaker that is no longer available."""
+        self.hubs.pop(uuid, None)
+        if (coordinator := self.coordinators.pop(uuid, None)) is None:
+            return
+        group = self.groups[coordinator]
+        group.discard(uuid)
+        if not group:
+            del self.groups[coordinator]
+        for member in group:
+            if (member_hub := self.hubs.get(member)) is not None:
+                member_hub.async_notify_listeners()
+
+    def coordinator(self, uuid: str) -> SpeakerStateHub | None:
+        """Return the state hub of the group coordinator of a speaker."""
+        return self.hubs.get(self.coordinators.get(uuid, uuid))
+
+    def group_members(self, uuid: str) -> list[str]:
+        """Return the uuids of all speakers in the group, coordinator first."""
+        coordinator = self.coordinators.get(uuid, uuid)
+        members = self.groups.get(coordinator, {uuid})
+        return [coordinator] + sorted(members - {coordinator})
+
+
+class SpeakerStateHub:
+    """Parse state messages of a speaker once and notify all its entities."""
+
+    def __init__(self, connection: MqttMediaConnection) -> None:
+        """Create empty state hub."""
+        self.connection = connection
+        self.data: dict[str, Any] | None = None
+        self.metrics: IntegrationMetrics | None = None
+        self.group_index: GroupIndex | None = None
+        self._listeners: list[Callable[[dict[str, Any]], None]] = []
+
+    @callback
+    def async_message_received(self, msg: ReceiveMessage) -> None:
+        """Handle state message from mqtt."""
+        if self.metrics is not None:
+            self._async_measured_message_received(msg, self.metrics)
+            return
+
+        try:
+            data = parse_state_payload(msg.payload)
+        except vol.MultipleInvalid as error:
+            _LOGGER.warning("Skipping update because of malformatted data: %s", error)
+            return
+
+        self._async_set_data(data)
+
+    @callback
+    def _async_measured_message_received(
+        self, msg: ReceiveMessage, metrics: IntegrationMetrics
+    ) -> None:
+        """Handle state message from mqtt and record the metrics."""
+        metrics.record_message(msg.topic)
+        start = time.perf_counter()
+        try:
+            data = parse_state_payload(msg.payload)
+        except vol.MultipleInvalid as error:
+            metrics.invalid_states += 1
+            _LOGGER.warning("Skipping update because of malformatted data: %s", error)
+            return
+        parsed = time.perf_counter()
+        metrics.state_parse.observe(parsed - start)
+
+        self._async_set_data(data)
+        metrics.state_handle.observe(time.perf_counter() - parsed)
+
+    @callback
+    def async_attribute_received(self, key: str, msg: ReceiveMessage) -> None:
+        """Handle a single property from a distinct state topic."""
+        if self.metrics is not None:
+            self.metrics.record_message(msg.topic)
+        try:
+            value = parse_state_attribute(key, msg.payload)
+        except vol.MultipleInvalid as error:
+            if self.metrics is not None:
+                self.metrics.invalid_states += 1
+            _LOGGER.warning("Skipping %s because of malformatted data: %s", key, error)
+            return
+
+        if self.data is None:
+            # Distinct topics never send the whole state, start with the required fields
+            data = {
+                ATTR_UUID: self.connection.identifier,
+                ATTR_NAME: self.connection.name,
+                ATTR_TRANSPORTSTATE: "STOPPED",
+            }
+        elif self.data.get(key) == value:
+            return
+        else:
+            data = dict(self.data)
+        data[key] = value
+        self._async_set_data(data)
+
+    @callback
+    def _async_set_data(self, data: dict[str, Any]) -> None:
+        """Store the latest state and notify the listeners."""
+        self.data = data
+        index = self.group_index
+        if index is not None:
+            index.async_update(self, data)
+
+        for listener in self._listeners:
+            listener(data)
+
+        if index is None:
+            return
+
+        # Group members show the playback state of their coordinator
+        uuid = data[ATTR_UUID]
+        for member in index.groups.get(uuid, ()):
+            if member != uuid and (hub := index.hubs.get(member)) is not None:
+                hub.async_notify_listeners()
+
+    @callback
+    def async_notify_listeners(self) -> None:
+        """Notify the listeners again with the current data."""
+        if self.data is not None:
+            for listener in self._listeners:
+                listener(self.data)
+
+    def playback_data(self, data: dict[str, Any]) -> dict[str, Any]:
+        """Return the state of the group coordinator, if this speaker is grouped.
+
+        The coordinator data is already parsed, so members can use it as is.
+        """
+        if self.group_index is None:
+            return data
+        coordinator = data.get(ATTR_COORDINATOR)
+        if coordinator is None or coordinator == data[ATTR_UUID]:
+            return data
+        if (hub := self.group_index.hubs.get(coordinator)) is None or not hub.data:
+            return data
+        return hub.data
+
+    @callback
+    def async_add_listener(
+        self, listener: Callable[[dict[str, Any]], None]
+    ) -> CALLBACK_TYPE:
+        """Listen for state updates, returns a callable to stop listening.
+
+        The listener is called right away if the state is already known.
+        """
+        self._listeners.append(listener)
+        if self.data is not None:
+            listener(self.data)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
@@ -0,0 +1,204 @@
+"""Fast decoder for sonos2mqtt state payloads."""
+# Exact type checks are on purpose, subclasses like bool for int need the schema.
+# pylint: disable=unidiomatic-typecheck
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from homeassistant.components.media_player import MediaPlayerState, RepeatMode
+
+from .const import (
+    ATTR_CHANNEL_MASTER,
+    ATTR_CROSSFADE,
+    ATTR_CURRENT_TRACK,
+    ATTR_ENQUEUED_METADATA,
+    ATTR_MUTE,
+    ATTR_NAME,
+    ATTR_POSITION,
+    ATTR_POSITION_LAST_UPDATE,
+    ATTR_REPEAT,
+    ATTR_SHUFFLE,
+    ATTR_TITLE,
+    ATTR_TRACK_ALBUM_ART_URI,
+    ATTR_TRACK_ARTIST,
+    ATTR_TRACK_URI,
+    ATTR_TRANSPORTSTATE,
+    ATTR_UPNP_CLASS,
+    ATTR_UUID,
+    ATTR_VOLUME,
+    MQTT_PAYLOAD,
+    REPEAT_ALL,
+    REPEAT_ONE,
+)
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover
+    _loads = json.loads
+
+# Transport states that are shown as paused, everything else is playing.
+TRANSPORT_STATES: dict[str, MediaPlayerState] = {
+    "PAUSED_PLAYBACK": MediaPlayerState.PAUSED,
+    "STOPPED": MediaPlayerState.PAUSED,
+}
+
+REPEAT_MODES: dict[str, RepeatMode] = {
+    REPEAT_ALL: RepeatMode.ALL,
+    REPEAT_ONE: RepeatMode.ONE,
+}
+
+_TRACK_STRINGS = (ATTR_TITLE, ATTR_TRACK_URI, ATTR_TRACK_ARTIST, ATTR_UPNP_CLASS)
+_METADATA_STRINGS = (ATTR_TITLE, ATTR_UPNP_CLASS)
+
+
+class _SlowPath(Exception):
+    """Raised when a payload needs the full voluptuous schema."""
+
+
+def _is_url(value: Any) -> bool:
+    """Cheap version of cv.url, only accepts the plain happy path."""
+    if type(value) is not str:
+        return False
+    if value.startswith("https://"):
+        host = value[8:9]
+    elif value.startswith("http://"):
+        host = value[7:8]
+    else:
+        return False
+    return host not in ("", "/", "?", "#")
+
+
+def _check_strings(data: dict[str, Any], keys: tuple[str, ...]) -> None:
+    """Make sure the optional keys are strings already."""
+    for key in keys:
+        if key in data and type(data[key]) is not str:
+            raise _SlowPath
+
+
+def _check_master(value: Any, value_type: type) -> None:
+    """Check the `{"Master": x}` channel dictionaries."""
+    if type(value) is not dict:
+        raise _SlowPath
+    master = value.get(ATTR_CHANNEL_MASTER)
+    if type(master) is not value_type:
+        raise _SlowPath
+    if value_type is int and master < 0:
+        raise _SlowPath
+
+
+def _check_mute(value: Any) -> None:
+    _check_master(value, bool)
+
+
+def _check_volume(value: Any) -> None:
+    _check_master(value, int)
+
+
+def _check_track(value: Any) -> None:
+    if type(value) is not dict:
+        raise _SlowPath
+    _check_strings(value, _TRACK_STRINGS)
+    if ATTR_TRACK_ALBUM_ART_URI in value and not _is_url(
+        value[ATTR_TRACK_ALBUM_ART_URI]
+    ):
+        raise _SlowPath
+
+
+def _check_metadata(value: Any) -> None:
+    if type(value) is not dict:
+        raise _SlowPath
+    _check_strings(value, _METADATA_STRINGS)
+
+
+def _check_position(value: Any) -> None:
+    # The position schema does not allow extra keys.
+    if type(value) is not dict or len(value) != 2:
+        raise _SlowPath
+    if type(value.get(ATTR_POSITION)) is not str:
+        raise _SlowPath
+    last_update = value.get(ATTR_POSITION_LAST_UPDATE)
+    if type(last_update) is not int or last_update < 0:
+        raise _SlowPath
+
+
+def _check_string(value: Any) -> None:
+    if type(value) is not str:
+        raise _SlowPath
+
+
+def _check_bool(value: Any) -> None:
+    if type(value) is not bool:
+        raise _SlowPath
+
+
+# Optional keys of MQTT_PAYLOAD and the check that matches their schema.
+FIELD_CHECKS = {
+    ATTR_MUTE: _check_mute,
+    ATTR_VOLUME: _check_volume,
+    ATTR_CURRENT_TRACK: _check_track,
+    ATTR_ENQUEUED_METADATA: _check_metadata,
+    ATTR_POSITION: _check_position,
+    ATTR_CROSSFADE: _check_string,
+    ATTR_SHUFFLE: _check_bool,
+    ATTR_REPEAT: _check_string,
+}
+
+_REQUIRED_STRINGS = (ATTR_UUID, ATTR_NAME, ATTR_TRANSPORTSTATE)
+
+# Properties sonos2mqtt publishes on their own topic in distinct mode
+ATTRIBUTE_CHECKS = {**FIELD_CHECKS, ATTR_TRANSPORTSTATE: _check_string}
+DISTINCT_ATTRIBUTES = frozenset(ATTRIBUTE_CHECKS)
+
+# Required fields, to validate a single property with MQTT_PAYLOAD
+_PLACEHOLDER_STATE = {key: "" for key in _REQUIRED_STRINGS}
+
+
+def _fast_parse(payload: str | bytes) -> dict[str, Any]:
+    """Decode and check payload without voluptuous, raise _SlowPath if unsure."""
+    try:
+        data = _loads(payload)
+    except ValueError as error:
+        raise _SlowPath from error
+
+    if type(data) is not dict:
+        raise _SlowPath
+    for key in _REQUIRED_STRINGS:
+        if type(data.get(key)) is not str:
+            raise _SlowPath
+    for key, check in FIELD_CHECKS.items():
+        if key in data:
+            check(data[key])
+    return data
+
+
+def parse_state_payload(payload: str | bytes) -> dict[str, Any]:
+    """Parse a sonos2mqtt state message.
+
+    Returns the same data as MQTT_PAYLOAD, payloads the fast path can not
+    vouch for are validated by MQTT_PAYLOAD, which raises vol.Invalid.
+    """
+    try:
+        return _fast_parse(payload)
+    except _SlowPath:
+        return MQTT_PAYLOAD(payload)
+
+
+def parse_state_attribute(key: str, payload: str | bytes) -> Any:
+    """Parse a single property from a distinct state topic, like `<uuid>/volume`.
+
+    Plain text payloads (like PLAYING) are used as string, values the fast
+    check can not vouch for are validated by MQTT_PAYLOAD, which raises vol.Invalid.
+    """
+    try:
+        value = _loads(payload)
+    except ValueError:
+        value = payload.decode() if isinstance(payload, bytes) else payload
+
+    try:
+        ATTRIBUTE_CHECKS[key](value)
+    except _SlowPath:
+        return MQTT_PAYLOAD(json.dumps({**_PLACEHOLDER_STATE, key: value}))[key]
+    return value
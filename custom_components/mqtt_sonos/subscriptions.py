@@ -0,0 +1,106 @@
+"""Registry of the mqtt subscriptions of a config entry."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.components import mqtt
+from homeassistant.components.mqtt.models import ReceiveMessage
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .ingest import MessageHandler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Subscription:
+    """A single mqtt subscription, shared by all callbacks of the topic."""
+
+    def __init__(self) -> None:
+        """Create subscription without callbacks."""
+        self.callbacks: list[MessageHandler] = []
+        self.unsubscribe: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_message_received(self, msg: ReceiveMessage) -> None:
+        """Call all callbacks of the topic."""
+        for msg_callback in self.callbacks:
+            msg_callback(msg)
+
+
+class SubscriptionRegistry:
+    """Track all mqtt subscriptions, so they can be removed on unload.
+
+    Callbacks for a topic that is already subscribed share the existing
+    mqtt subscription, the topic is unsubscribed when its last callback
+    is removed.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Create empty registry."""
+        self.hass = hass
+        self._subscriptions: dict[str, _Subscription] = {}
+        self._closed = False
+
+    async def async_subscribe(
+        self, topic: str, msg_callback: MessageHandler
+    ) -> CALLBACK_TYPE:
+        """Subscribe to a topic, returns a callable to remove the callback."""
+        if self._closed:
+            _LOGGER.debug("Not subscribing to %s, the entry is unloaded", topic)
+            return lambda: None
+
+        if (subscription := self._subscriptions.get(topic)) is None:
+            subscription = self._subscriptions[topic] = _Subscription()
+            subscription.callbacks.append(msg_callback)
+            try:
+                unsubscribe = await mqtt.async_subscribe(
+                    self.hass, topic, subscription.async_message_received
+                )
+            except HomeAssistantError:
+                self._async_remove(topic, subscription)
+                raise
+            if self._subscriptions.get(topic) is subscription:
+                subscription.unsubscribe = unsubscribe
+            else:
+                # Removed or unloaded while subscribing
+                unsubscribe()
+        else:
+            subscription.callbacks.append(msg_callback)
+
+        @callback
+        def remove_callback() -> None:
+            if msg_callback not in subscription.callbacks:
+                return
+            subscription.callbacks.remove(msg_callback)
+            if not subscription.callbacks:
+                self._async_remove(topic, subscription)
+
+        return remove_callback
+
+    @callback
+    def _async_remove(self, topic: str, subscription: _Subscription) -> None:
+        """Unsubscribe a topic, if it still belongs to this subscription."""
+        if self._subscriptions.get(topic) is subscription:
+            del self._subscriptions[topic]
+        if subscription.unsubscribe is not None:
+            subscription.unsubscribe()
+            subscription.unsubscribe = None
+
+    @callback
+    def async_unsubscribe_all(self) -> None:
+        """Remove all subscriptions, call on unload."""
+        self._closed = True
+        for topic, subscription in list(self._subscriptions.items()):
+            subscription.callbacks.clear()
+            self._async_remove(topic, subscription)
+
+    @property
+    def count(self) -> int:
+        """Return the number of live mqtt subscriptions."""
+        return len(self._subscriptions)
+
+    @property
+    def topics(self) -> list[str]:
+        """Return the subscribed topics."""
+        return sorted(self._subscriptions)
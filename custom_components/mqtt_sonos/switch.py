@@ -4,16 +4,13 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-import voluptuous as vol
-
-from homeassistant.components import mqtt
-from homeassistant.components.mqtt.models import ReceiveMessage
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import ATTR_CROSSFADE, DOMAIN, MQTT_PAYLOAD
+from .const import ATTR_CROSSFADE, DOMAIN, EVENT_DISCOVERED
 from .mqtt_media_connection import MqttMediaConnection
 from .sonos_manager import SonosManager
 
@@ -32,7 +29,22 @@ async def async_setup_entry(
     entities = []
     for _, conn in connections.items():
         entities.append(CrossfadeSwitchEntity(conn, hass))
-    async_add_entries(entities, True)
+    async_add_entries(entities, False)
+
+    @callback
+    def event_create_entity(connections: list[MqttMediaConnection]) -> None:
+        """Add entities once they are discovered"""
+        _LOGGER.debug("Adding %d crossfade switches", len(connections))
+        async_add_entries(
+            [CrossfadeSwitchEntity(connection, hass) for connection in connections],
+            False,
+        )
+
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, f"{EVENT_DISCOVERED}_{config_entry.entry_id}", event_create_entity
+        )
+    )
 
 
 class CrossfadeSwitchEntity(SwitchEntity):
@@ -50,27 +62,27 @@ class CrossfadeSwitchEntity(SwitchEntity):
 
     async def async_added_to_hass(self) -> None:
         """Configure entity once added to hass."""
-
-        @callback
-        def message_received(msg: ReceiveMessage) -> None:
-            """Handle update from mqtt."""
-            try:
-                data = MQTT_PAYLOAD(msg.payload)
-            except vol.MultipleInvalid as error:
-                _LOGGER.warning(
-                    "Skipping update because of malformatted data: %s", error
-                )
-                return
-            _LOGGER.debug("Got update from mqtt %s", data)
-            self._handle_device_update(data)
-
-        await mqtt.async_subscribe(self.hass, self._conn.state_topic, message_received)
-
-    def _handle_device_update(self, data) -> None:
+        self.async_on_remove(
+            self._conn.state.async_add_listener(self._handle_device_update)
+        )
+        self.async_on_remove(
+            self._conn.async_add_listener(self._handle_connection_update)
+        )
+
+    @callback
+    def _handle_connection_update(self) -> None:
+        """Apply changed discovery info without recreating the entity."""
+        if self._conn.removed:
+            self.hass.async_create_task(self.async_remove(force_remove=True))
+            return
+        self._attr_device_info = self._conn.device_info
+
+    @callback
+    def _handle_device_update(self, data: dict[str, Any]) -> None:
         """Handle update from mqtt."""
         old_state = self._attr_is_on
         self._attr_is_on = ATTR_CROSSFADE in data and data[ATTR_CROSSFADE] == "On"
-        if old_state != self._attr_state or not self._attr_available:
+        if old_state != self._attr_is_on or not self._attr_available:
             self._attr_available = True
             self.async_write_ha_state()
 
@@ -0,0 +1 @@
+"""Tests of the mqtt_sonos integration."""
@@ -0,0 +1,189 @@
+"""Offline stand-ins for the Home Assistant and mqtt parts used by the tests."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine
+import json
+from typing import Any
+
+from homeassistant.components.mqtt.models import ReceiveMessage
+
+from custom_components.mqtt_sonos.const import CONF_UPDATE_WINDOW, DISCOVERY_PAYLOAD
+from custom_components.mqtt_sonos.media_player import SonosMediaPlayerEntity
+from custom_components.mqtt_sonos.mqtt_media_connection import MqttMediaConnection
+
+UUID = "RINCON_000E58000000001400"
+MEMBER_UUID = "RINCON_000E58000000001401"
+
+
+def discovery(
+    uuid: str = UUID, name: str = "Kitchen", prefix: str = "sonos2mqtt"
+) -> str:
+    """Create discovery payload of a speaker."""
+    return json.dumps(
+        {
+            "name": name,
+            "unique_id": uuid,
+            "state_topic": f"{prefix}/{uuid}",
+            "command_topic": f"{prefix}/{uuid}/control",
+            "availability_topic": f"{prefix}/status",
+            "device_class": "speaker",
+            "icon": "mdi:speaker",
+            "device": {
+                "identifiers": [uuid],
+                "manufacturer": "Sonos",
+                "model": "Sonos One",
+                "name": name,
+                "sw_version": "74.0-43160",
+            },
+        }
+    )
+
+
+def state(uuid: str = UUID, name: str = "Kitchen", **values: Any) -> dict[str, Any]:
+    """Create state of a speaker coordinating its own group."""
+    return {
+        "uuid": uuid,
+        "name": name,
+        "groupName": name,
+        "coordinatorUuid": uuid,
+        "transportState": "STOPPED",
+        "volume": {"Master": 12, "LF": 100, "RF": 100},
+        "mute": {"Master": False, "LF": False, "RF": False},
+        **values,
+    }
+
+
+class FakeConfigEntry:
+    """Config entry with just the fields used by the integration."""
+
+    entry_id = "test"
+
+    def __init__(self, options: dict[str, Any] | None = None) -> None:
+        """Create config entry with options."""
+        self.options = options or {}
+        self.data: dict[str, Any] = {}
+        self.unload_callbacks: list[Callable[[], None]] = []
+
+    def async_on_unload(self, func: Callable[[], None]) -> None:
+        """Keep a callback to call on unload."""
+        self.unload_callbacks.append(func)
+
+
+class FakeHass:
+    """Home Assistant stand-in, the tests never touch the state machine."""
+
+    def __init__(self) -> None:
+        """Create empty hass."""
+        self.data: dict[str, Any] = {}
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the running event loop."""
+        return asyncio.get_running_loop()
+
+    def async_create_task(
+        self, target: Coroutine[Any, Any, Any], name: str | None = None
+    ) -> asyncio.Task[Any]:
+        """Create task on the running event loop."""
+        return self.loop.create_task(target, name=name)
+
+    async_create_background_task = async_create_task
+
+
+class FakeMqtt:
+    """Records subscriptions and published messages instead of using a broker."""
+
+    def __init__(self) -> None:
+        """Create connected mqtt without subscriptions."""
+        self.connected = True
+        self.published: list[tuple[str, Any]] = []
+        self.subscriptions: dict[str, list[Callable[[ReceiveMessage], None]]] = {}
+        self.subscribe_calls = 0
+
+    def is_connected(self, hass: Any) -> bool:
+        """Return if the broker is connected."""
+        return self.connected
+
+    async def async_publish(self, hass: Any, topic: str, payload: str, qos=0) -> None:
+        """Record a published message, with the payload decoded."""
+        self.published.append((topic, json.loads(payload)))
+
+    async def async_subscribe(
+        self, hass: Any, topic: str, msg_callback: Callable[[ReceiveMessage], None]
+    ) -> Callable[[], None]:
+        """Record a subscription, returns a callable to unsubscribe."""
+        self.subscribe_calls += 1
+        self.subscriptions.setdefault(topic, []).append(msg_callback)
+
+        def unsubscribe() -> None:
+            self.subscriptions[topic].remove(msg_callback)
+            if not self.subscriptions[topic]:
+                del self.subscriptions[topic]
+
+        return unsubscribe
+
+    def receive(self, topic: str, payload: str) -> None:
+        """Deliver a message to the subscriptions of exactly this topic."""
+        for msg_callback in list(self.subscriptions.get(topic, [])):
+            msg_callback(message(topic, payload))
+
+    @property
+    def commands(self) -> list[tuple[str, Any]]:
+        """Return the published commands and their inputs."""
+        return [(payload["command"], payload["input"]) for _, payload in self.published]
+
+
+class FakeTimers:
+    """Replaces async_call_later, the tests fire the timers themselves."""
+
+    def __init__(self) -> None:
+        """Create without timers."""
+        self.pending: list[tuple[float, Callable[[Any], Any]]] = []
+
+    def __call__(
+        self, hass: Any, delay: float, action: Callable[[Any], Any]
+    ) -> Callable[[], None]:
+        """Schedule a timer, returns a callable to cancel it."""
+        timer = (delay, action)
+        self.pending.append(timer)
+
+        def cancel() -> None:
+            if timer in self.pending:
+                self.pending.remove(timer)
+
+        return cancel
+
+    async def async_fire_all(self) -> None:
+        """Fire all pending timers, including timers they schedule."""
+        while self.pending:
+            _, action = self.pending.pop(0)
+            if asyncio.iscoroutine(result := action(None)):
+                await result
+
+
+def message(topic: str, payload: str) -> ReceiveMessage:
+    """Create a received mqtt message."""
+    return ReceiveMessage(topic, payload, 0, False, topic, None)
+
+
+def create_connection(
+    hass: FakeHass | None = None,
+    options: dict[str, Any] | None = None,
+    uuid: str = UUID,
+) -> MqttMediaConnection:
+    """Create connection of a discovered speaker."""
+    return MqttMediaConnection(
+        hass or FakeHass(),
+        FakeConfigEntry(options),
+        DISCOVERY_PAYLOAD(discovery(uuid)),
+    )
+
+
+def create_entity(hass: FakeHass | None = None) -> SonosMediaPlayerEntity:
+    """Create media player entity that writes its state to nowhere."""
+    hass = hass or FakeHass()
+    conn = create_connection(hass, {CONF_UPDATE_WINDOW: 0})
+    entity = SonosMediaPlayerEntity(conn, hass)
+    entity.async_write_ha_state = lambda: None
+    return entity
@@ -0,0 +1,46 @@
+"""Fixtures of the mqtt_sonos tests."""
+from __future__ import annotations
+
+import asyncio
+import inspect
+
+import pytest
+
+from custom_components.mqtt_sonos import mqtt_media_connection, subscriptions
+
+from .common import FakeHass, FakeMqtt, FakeTimers
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: pytest.Function) -> bool | None:
+    """Run coroutine tests on a new event loop."""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    arguments = {
+        name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames
+    }
+    asyncio.run(pyfuncitem.obj(**arguments))
+    return True
+
+
+@pytest.fixture
+def hass() -> FakeHass:
+    """Return Home Assistant stand-in."""
+    return FakeHass()
+
+
+@pytest.fixture
+def fake_mqtt(monkeypatch: pytest.MonkeyPatch) -> FakeMqtt:
+    """Replace the mqtt component used by the connections and subscriptions."""
+    fake = FakeMqtt()
+    monkeypatch.setattr(mqtt_media_connection, "mqtt", fake)
+    monkeypatch.setattr(subscriptions, "mqtt", fake)
+    return fake
+
+
+@pytest.fixture
+def timers(monkeypatch: pytest.MonkeyPatch) -> FakeTimers:
+    """Replace the timers of the command window."""
+    fake = FakeTimers()
+    monkeypatch.setattr(mqtt_media_connection, "async_call_later", fake)
+    return fake
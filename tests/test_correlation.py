@@ -0,0 +1,78 @@
+"""Tests of the request and reply correlation."""
+from __future__ import annotations
+
+import asyncio
+import json
+
+from homeassistant.exceptions import HomeAssistantError
+import pytest
+
+from custom_components.mqtt_sonos.correlation import RequestCorrelator
+from custom_components.mqtt_sonos.subscriptions import SubscriptionRegistry
+
+from .common import FakeHass, FakeMqtt, create_connection, message
+
+REPLY_WILDCARD = "sonos2mqtt/reply/+"
+
+
+async def _async_correlator(hass: FakeHass) -> RequestCorrelator:
+    """Create correlator subscribed to the reply topics."""
+    correlator = RequestCorrelator(hass, "sonos2mqtt", SubscriptionRegistry(hass))
+    await correlator.async_subscribe()
+    return correlator
+
+
+async def test_reply(hass: FakeHass, fake_mqtt: FakeMqtt) -> None:
+    """Each request gets the reply sent to its own reply topic."""
+    correlator = await _async_correlator(hass)
+    conn = create_connection(hass)
+    conn.correlator = correlator
+    assert REPLY_WILDCARD in fake_mqtt.subscriptions
+
+    requests = [
+        hass.async_create_task(conn.async_request("adv-command", {"cmd": str(index)}))
+        for index in range(3)
+    ]
+    await asyncio.sleep(0)
+    assert correlator.pending == 3
+
+    # Reply in reverse order
+    for _, payload in reversed(fake_mqtt.published):
+        reply = payload["input"]["reply"]
+        for msg_callback in fake_mqtt.subscriptions[REPLY_WILDCARD]:
+            msg_callback(
+                message(
+                    f"sonos2mqtt/{reply}", json.dumps({"cmd": payload["input"]["cmd"]})
+                )
+            )
+
+    assert await asyncio.gather(*requests) == [{"cmd": "0"}, {"cmd": "1"}, {"cmd": "2"}]
+    assert correlator.pending == 0
+    assert correlator.replies == 3
+
+
+async def test_timeout(hass: FakeHass, fake_mqtt: FakeMqtt) -> None:
+    """A request without reply raises an error after the timeout."""
+    correlator = await _async_correlator(hass)
+    conn = create_connection(hass)
+    conn.correlator = correlator
+
+    with pytest.raises(HomeAssistantError):
+        await conn.async_request("adv-command", {}, timeout=0.01)
+    assert correlator.pending == 0
+    assert correlator.timeouts == 1
+
+
+async def test_cancel_all(hass: FakeHass, fake_mqtt: FakeMqtt) -> None:
+    """Pending requests are cancelled on unload."""
+    correlator = await _async_correlator(hass)
+    conn = create_connection(hass)
+    conn.correlator = correlator
+
+    request = hass.async_create_task(conn.async_request("adv-command", {}))
+    await asyncio.sleep(0)
+    correlator.async_cancel_all()
+
+    with pytest.raises(asyncio.CancelledError):
+        await request
+    assert correlator.pending == 0
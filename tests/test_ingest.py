@@ -0,0 +1,98 @@
+"""Tests of the ingest queue."""
+from __future__ import annotations
+
+import asyncio
+
+from custom_components.mqtt_sonos.ingest import IngestQueue
+
+from .common import FakeHass, message
+
+
+async def _async_drain(queue: IngestQueue) -> None:
+    """Let the queue handle all pending slices."""
+    while queue.depth:
+        await asyncio.sleep(0)
+
+
+async def test_coalesce_same_topic(hass: FakeHass) -> None:
+    """A newer message replaces the pending message and keeps its place."""
+    queue = IngestQueue(hass)
+    handled: list[tuple[str, str]] = []
+
+    def handler(msg):
+        handled.append((msg.topic, msg.payload))
+
+    queue.async_put(handler, message("a", "1"))
+    queue.async_put(handler, message("b", "1"))
+    queue.async_put(handler, message("a", "2"))
+    await _async_drain(queue)
+
+    assert handled == [("a", "2"), ("b", "1")]
+    assert queue.as_dict()["coalesced"] == 1
+
+
+async def test_drop_oldest_when_full(hass: FakeHass) -> None:
+    """The oldest pending message is dropped when the queue is full."""
+    queue = IngestQueue(hass, max_size=3)
+    handled: list[str] = []
+
+    for topic in "abcde":
+        queue.async_put(lambda msg: handled.append(msg.topic), message(topic, ""))
+    await _async_drain(queue)
+
+    assert handled == ["c", "d", "e"]
+    assert queue.dropped == 2
+
+
+async def test_kept_messages_first_and_never_dropped(hass: FakeHass) -> None:
+    """Discovery messages are never dropped and handled before the others."""
+    queue = IngestQueue(hass, max_size=2, slice_size=3)
+    handled: list[str] = []
+
+    def handler(msg):
+        handled.append(msg.topic)
+
+    for index in range(3):
+        queue.async_put(handler, message(f"state/{index}", ""))
+    for index in range(4):
+        queue.async_put(handler, message(f"discovery/{index}", ""), keep=True)
+    assert queue.depth == 6
+    await _async_drain(queue)
+
+    assert handled == [
+        "discovery/0",
+        "discovery/1",
+        "discovery/2",
+        "discovery/3",
+        "state/1",
+        "state/2",
+    ]
+    assert queue.dropped == 1
+
+
+async def test_handler_error_does_not_stop_queue(hass: FakeHass) -> None:
+    """An error in a handler is logged, the other messages are still handled."""
+    queue = IngestQueue(hass)
+    handled: list[str] = []
+
+    def failing(msg):
+        raise ValueError
+
+    queue.async_put(failing, message("a", ""))
+    queue.async_put(lambda msg: handled.append(msg.topic), message("b", ""))
+    await _async_drain(queue)
+
+    assert handled == ["b"]
+
+
+async def test_clear(hass: FakeHass) -> None:
+    """Pending messages are dropped on unload."""
+    queue = IngestQueue(hass)
+    handled: list[str] = []
+
+    queue.async_put(lambda msg: handled.append(msg.topic), message("a", ""))
+    queue.async_clear()
+    await asyncio.sleep(0)
+
+    assert handled == []
+    assert queue.depth == 0
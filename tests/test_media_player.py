@@ -0,0 +1,74 @@
+"""Tests of the media player entity."""
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+from homeassistant.components.media_player import MediaPlayerEntityFeature
+from homeassistant.exceptions import HomeAssistantError
+import pytest
+
+from custom_components.mqtt_sonos.const import DOMAIN
+from custom_components.mqtt_sonos.media_player import SonosMediaPlayerEntity
+from custom_components.mqtt_sonos.speaker_state import GroupIndex
+
+from .common import (
+    MEMBER_UUID,
+    UUID,
+    FakeHass,
+    FakeMqtt,
+    create_connection,
+    create_entity,
+    message,
+    state,
+)
+
+
+def _group_entity(
+    index: GroupIndex, entity_id: str, data: dict
+) -> SonosMediaPlayerEntity:
+    """Create entity in the group index and receive a state."""
+    entity = create_entity()
+    entity.entity_id = entity_id
+    conn = entity._conn
+    conn.media_player_entity_id = entity_id
+    conn.state.group_index = index
+    conn.state.async_add_listener(entity._handle_device_update)
+    conn.state.async_message_received(message(conn.state_topic, json.dumps(data)))
+    return entity
+
+
+def test_supports_grouping() -> None:
+    """Join and unjoin are only allowed for entities supporting grouping."""
+    entity = create_entity()
+    assert entity.supported_features & MediaPlayerEntityFeature.GROUPING
+
+
+def test_group_members_attribute() -> None:
+    """Both speakers of a group show all members, coordinator first."""
+    index = GroupIndex()
+    member_state = state(MEMBER_UUID, "Living room", coordinatorUuid=UUID)
+    coordinator = _group_entity(index, "media_player.kitchen", state())
+    member = _group_entity(index, "media_player.living_room", member_state)
+
+    members = ["media_player.kitchen", "media_player.living_room"]
+    assert coordinator.state_attributes["group_members"] == members
+    assert member.state_attributes["group_members"] == members
+
+
+async def test_join_speaker_of_other_bridge(
+    hass: FakeHass, fake_mqtt: FakeMqtt
+) -> None:
+    """Speakers of every bridge can join, unknown entities are an error."""
+    entity = create_entity(hass)
+    other = create_connection(hass, uuid=MEMBER_UUID)
+    hass.data[DOMAIN] = {
+        "a": SimpleNamespace(entity_connections={"media_player.kitchen": entity._conn}),
+        "b": SimpleNamespace(entity_connections={"media_player.office": other}),
+    }
+
+    await entity.async_join_players(["media_player.kitchen", "media_player.office"])
+    assert [topic for topic, _ in fake_mqtt.published] == [other.command_topic]
+
+    with pytest.raises(HomeAssistantError):
+        await entity.async_join_players(["media_player.unknown"])
@@ -0,0 +1,63 @@
+"""Tests of the commands sent by a connection."""
+from __future__ import annotations
+
+from custom_components.mqtt_sonos.metrics import IntegrationMetrics
+
+from .common import FakeHass, FakeMqtt, FakeTimers, create_connection
+
+
+async def test_last_volume_in_window(
+    hass: FakeHass, fake_mqtt: FakeMqtt, timers: FakeTimers
+) -> None:
+    """Only the last volume within the command window is sent after the first."""
+    conn = create_connection(hass)
+
+    for volume in (10, 20, 30):
+        await conn.send_command("volume", volume)
+    assert fake_mqtt.commands == [("volume", 10)]
+
+    await timers.async_fire_all()
+    assert fake_mqtt.commands == [("volume", 10), ("volume", 30)]
+
+
+async def test_order_around_other_commands(
+    hass: FakeHass, fake_mqtt: FakeMqtt, timers: FakeTimers
+) -> None:
+    """A delayed volume is sent before a command that is not coalesced."""
+    conn = create_connection(hass)
+
+    await conn.send_command("volume", 10)
+    await conn.send_command("volume", 20)
+    await conn.send_command("next")
+    await timers.async_fire_all()
+
+    assert fake_mqtt.commands == [("volume", 10), ("volume", 20), ("next", None)]
+
+
+async def test_buffer_while_offline(
+    hass: FakeHass, fake_mqtt: FakeMqtt, timers: FakeTimers
+) -> None:
+    """Absolute commands collapse while offline, toggles and others are kept."""
+    conn = create_connection(hass)
+    conn.state.metrics = IntegrationMetrics()
+    fake_mqtt.connected = False
+
+    for command in ("play", "toggle", "toggle", "pause", "next"):
+        await conn.send_command(command)
+    await conn.send_command("mute", True)
+    await conn.send_command("unmute")
+    assert fake_mqtt.published == []
+    assert conn.offline_depth == 5
+
+    fake_mqtt.connected = True
+    await conn.async_flush_offline_commands()
+
+    assert fake_mqtt.commands == [
+        ("toggle", None),
+        ("toggle", None),
+        ("pause", None),
+        ("next", None),
+        ("unmute", None),
+    ]
+    assert conn.offline_depth == 0
+    assert conn.state.metrics.command_flush.count == 1
@@ -0,0 +1,65 @@
+"""Tests of the optimistic state of commands."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.mqtt_sonos import optimistic
+from custom_components.mqtt_sonos.metrics import IntegrationMetrics
+from custom_components.mqtt_sonos.optimistic import PENDING_TIMEOUT, PendingCommands
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    """Replace the monotonic clock of the pending commands."""
+    fake = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(optimistic, "time", SimpleNamespace(monotonic=lambda: fake.now))
+    return fake
+
+
+def test_keep_expected_until_confirmed(clock: SimpleNamespace) -> None:
+    """A stale state keeps the shown value, the confirming state records it."""
+    entity = SimpleNamespace(_attr_state="paused", _attr_volume_level=0.1)
+    metrics = IntegrationMetrics()
+    pending = PendingCommands()
+
+    pending.expect(entity, "play", "_attr_state", "playing", "buffering")
+    pending.expect(entity, "volume", "_attr_volume_level", 0.3)
+    assert entity._attr_state == "buffering"
+
+    # State from before the commands took effect
+    clock.now += 0.2
+    entity._attr_state, entity._attr_volume_level = "paused", 0.1
+    pending.reconcile(entity, metrics)
+    assert entity._attr_state == "buffering"
+    assert entity._attr_volume_level == 0.3
+
+    clock.now += 0.3
+    entity._attr_state, entity._attr_volume_level = "playing", 0.3001
+    pending.reconcile(entity, metrics)
+    assert entity._attr_state == "playing"
+    assert metrics.command_round_trip["play"].count == 1
+    assert metrics.command_round_trip["volume"].count == 1
+    assert metrics.round_trip_average == pytest.approx(500)
+
+    # Confirmed commands no longer override the state
+    entity._attr_state = "paused"
+    pending.reconcile(entity, metrics)
+    assert entity._attr_state == "paused"
+
+
+def test_expire_unconfirmed(clock: SimpleNamespace) -> None:
+    """The real state is shown when the command is not confirmed in time."""
+    entity = SimpleNamespace(_attr_is_volume_muted=False)
+    metrics = IntegrationMetrics()
+    pending = PendingCommands()
+
+    pending.expect(entity, "mute", "_attr_is_volume_muted", True)
+    clock.now += PENDING_TIMEOUT + 1
+    entity._attr_is_volume_muted = False
+    pending.reconcile(entity, metrics)
+
+    assert entity._attr_is_volume_muted is False
+    assert metrics.unconfirmed_commands == 1
+    assert metrics.command_round_trip == {}
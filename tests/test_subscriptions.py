@@ -0,0 +1,48 @@
+"""Tests of the subscription registry."""
+from __future__ import annotations
+
+from custom_components.mqtt_sonos.subscriptions import SubscriptionRegistry
+
+from .common import FakeHass, FakeMqtt
+
+
+async def test_share_subscription(hass: FakeHass, fake_mqtt: FakeMqtt) -> None:
+    """Callbacks of the same topic share one mqtt subscription."""
+    registry = SubscriptionRegistry(hass)
+    received: list[str] = []
+
+    remove_first = await registry.async_subscribe(
+        "sonos2mqtt/+", lambda msg: received.append("first")
+    )
+    remove_second = await registry.async_subscribe(
+        "sonos2mqtt/+", lambda msg: received.append("second")
+    )
+    assert fake_mqtt.subscribe_calls == 1
+    assert registry.topics == ["sonos2mqtt/+"]
+
+    fake_mqtt.receive("sonos2mqtt/+", "{}")
+    assert received == ["first", "second"]
+
+    remove_first()
+    remove_first()
+    assert registry.count == 1
+    remove_second()
+    assert registry.count == 0
+    assert fake_mqtt.subscriptions == {}
+
+
+async def test_unsubscribe_all(hass: FakeHass, fake_mqtt: FakeMqtt) -> None:
+    """All topics are unsubscribed on unload, later subscriptions are ignored."""
+    registry = SubscriptionRegistry(hass)
+
+    remove = await registry.async_subscribe("sonos2mqtt/+", lambda msg: None)
+    await registry.async_subscribe("sonos2mqtt/discovery/#", lambda msg: None)
+    registry.async_unsubscribe_all()
+
+    assert registry.count == 0
+    assert fake_mqtt.subscriptions == {}
+    remove()
+
+    await registry.async_subscribe("sonos2mqtt/reply/+", lambda msg: None)
+    assert fake_mqtt.subscriptions == {}
+    assert fake_mqtt.subscribe_calls == 2